@@ -0,0 +1,241 @@
+import argparse
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from generator import SyntheticLogGenerator
+import json
+import numpy as np
+import os
+import pandas as pd
+import platform
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'root_cause'))
+
+from messages import LogMessages
+from output import DisplayNoOutput
+from parser import TemplateParser
+from preparation import ContentMasking, DatasetPreparation, TemplateMatching
+from search import RootCauseSearch
+from settings import SearchSettings, SearchStrategy
+
+
+class Benchmark:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.results_file = open(args.results_file, 'a')
+        self.run = {
+            'started': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'revision': self.git_revision(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count()
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.results_file.close()
+
+    @staticmethod
+    def git_revision() -> str:
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    @contextmanager
+    def timed(self, result: dict, **fields):
+        start_time = time.perf_counter()
+        yield
+        self.write({**result, **fields, 'seconds': round(time.perf_counter() - start_time, 6)})
+
+    def write(self, result: dict):
+        # Every measurement is written as one JSON line, so that results of different runs can be appended and compared.
+        result = {**self.run, **result}
+        self.results_file.write(json.dumps(result) + '\n')
+        self.results_file.flush()
+        value = f'{result["seconds"]:10.3f} s' if 'seconds' in result else f'{result["recall"]:10.1%}'
+        stage = result['stage'] if 'occurrences' not in result else f'{result["stage"]} {result["occurrences"]} occurrences'
+        print(f'{result["rows"]:>12} rows  {stage:<30} {value}')
+
+    def generate(self, rows: int) -> tuple[SearchSettings, dict, list[dict]]:
+        # The synthetic dataset of each size is only created once. Returns the settings for searching it, the fields of
+        # its results and its injected errors.
+        name = f'synthetic_{rows}_{self.args.seed}'
+        csv_file = os.path.join(self.args.work_dir, f'{name}.source.csv')
+        generator = SyntheticLogGenerator(
+            rows, self.args.services, self.args.templates, self.args.errors, self.args.error_recurrence,
+            self.args.root_cause_length, self.args.mean_gap_ms, self.args.seed
+        )
+        result = {'rows': rows, **generator.metadata()['parameters']}
+
+        if not os.path.isfile(csv_file) or not os.path.isfile(generator.metadata_file(csv_file)):
+            with self.timed({**result, 'benchmark': 'preparation'}, stage='generate'):
+                generator.write(csv_file)
+        with open(generator.metadata_file(csv_file)) as file:
+            errors = json.load(file)['errors']
+
+        settings = SearchSettings(
+            dataset_name=name,
+            source_csv_file=csv_file,
+            storage_dir=self.args.work_dir,
+            drain_config_file=self.args.drain_config_file,
+            strategies=[SearchStrategy(window_seconds=self.args.window_seconds)],
+            service_filter=[],
+            content_filter=[],
+            output=DisplayNoOutput(),
+            keep_dataset_loaded=True
+        )
+        return settings, result, errors
+
+    def run_size(self, rows: int):
+        settings, result, errors = self.generate(rows)
+        result = {**result, 'benchmark': 'preparation'}
+        csv_file = settings.source_csv_file
+        preparation = DatasetPreparation(settings)
+        if os.path.isfile(settings.temporary_drain_state_file):
+            os.remove(settings.temporary_drain_state_file)
+
+        # The stages of DatasetPreparation.get, without storing intermediate files.
+        with self.timed(result, stage='read_csv'):
+            log_messages = LogMessages(preparation.read_dataframe(csv_file))
+            preparation.prepare_log_messages(log_messages)
+        with self.timed(result, stage='mask_contents'):
+            masking = ContentMasking(settings.drain_config_file, False, False)
+            masking.mask_contents(log_messages.log_messages['content'].unique())
+        with self.timed(result, stage='create_template_clusters'):
+            parser = TemplateParser(settings.drain_config_file, settings.temporary_drain_state_file, mask_contents=False)
+            preparation.add_to_template_clusters(log_messages, parser, False, masking)
+            parser.save_state()
+        with self.timed(result, stage='assign_templates'):
+            matching = TemplateMatching(
+                settings.drain_config_file, settings.temporary_drain_state_file, False, mask_contents=False
+            )
+            log_messages.map_unique_values(
+                'content', 'template_id', lambda contents: matching.match_template_ids(masking.get(contents))
+            )
+        with self.timed(result, stage='add_service_template_ids'):
+            log_messages.add_service_template_ids()
+        with self.timed(result, stage='encode_columns'):
+            log_messages.encode_columns()
+        os.remove(settings.temporary_drain_state_file)
+
+        root_cause_search = RootCauseSearch(settings, log_messages)
+        for error in errors[:self.args.searches]:
+            self.run_search(root_cause_search, error, {**result, 'benchmark': 'search', 'line_id': error['line_id']})
+
+    def run_noise_counting(self, rows: int):
+        # Counting the values outside the time windows before the occurrences of an error, with increasing numbers of
+        # occurrences. The sweep is compared with filtering the log messages once for each time window, which was used
+        # before. Filtering is only measured up to a number of occurrences, because it gets slow for many of them.
+        settings, result, _ = self.generate(rows)
+        result = {**result, 'benchmark': 'noise_counting', 'window_seconds': self.args.window_seconds}
+        log_messages = LogMessages(DatasetPreparation(settings).read_dataframe(settings.source_csv_file))
+        DatasetPreparation.prepare_log_messages(log_messages)
+        log_messages.encode_columns()
+
+        random = np.random.default_rng(self.args.seed)
+        timestamps = log_messages.log_messages['timestamp']
+        for occurrences in self.args.occurrences:
+            positions = np.sort(random.choice(len(timestamps), min(occurrences, len(timestamps)), replace=False))
+            end_times = timestamps.iloc[positions]
+
+            with self.timed(result, stage='sweep', occurrences=occurrences):
+                counts = log_messages.count_outside_time_windows('content', end_times, self.args.window_seconds)
+            if occurrences > self.args.filtering_max_occurrences:
+                continue
+            with self.timed(result, stage='filtering', occurrences=occurrences):
+                expected = self.count_outside_time_windows_by_filtering(
+                    log_messages, 'content', end_times, self.args.window_seconds
+                )
+            if not counts.sort_index().equals(expected[expected > 0].sort_index()):
+                raise AssertionError(f'Counts of the sweep differ from filtering for {occurrences} occurrences.')
+
+    @staticmethod
+    def count_outside_time_windows_by_filtering(log_messages: LogMessages, column: str, end_times: pd.Series,
+                                                seconds: int) -> pd.Series:
+        # LogMessages.count_outside_time_windows before the sweep, which filters the remaining log messages once for
+        # each time window.
+        end_times = end_times.to_list()
+        end_times.append(log_messages.log_messages['timestamp'].max())
+        remaining = log_messages.log_messages
+        for end_time in end_times:
+            start_time = end_time - pd.Timedelta(seconds=seconds)
+            remaining = remaining[(remaining['timestamp'] < start_time) | (remaining['timestamp'] > end_time)]
+        return remaining[column].value_counts()
+
+    def run_search(self, root_cause_search: RootCauseSearch, error: dict, result: dict):
+        # The phases of RootCauseSearch.search_strategy. Each phase finds the results of the previous ones in the cache,
+        # which is cleared before each search.
+        root_cause_search.cache.clear()
+        root_cause_search.clear_root_cause()
+        error_line_id = error['line_id']
+        message = root_cause_search.log_messages.get_by_id(error_line_id)
+
+        for number, strategy in enumerate(root_cause_search.settings.strategies):
+            fields = {'strategy': number}
+            with self.timed(result, stage='occurrence_lookup', **fields):
+                root_cause_search.occurrence_timestamps(strategy.intersection_occurrences_col, message)
+                root_cause_search.occurrence_timestamps(strategy.hidden_occurrences_col, message)
+            with self.timed(result, stage='window_intersection', **fields):
+                root_cause_search.strategy_intersection(message, strategy)
+            with self.timed(result, stage='noise_counting', **fields):
+                root_cause_search.strategy_outside_windows_count(message, strategy)
+            with self.timed(result, stage='candidate_filtering', **fields):
+                candidates = root_cause_search.strategy_candidates(error_line_id, message, strategy)
+            with self.timed(result, stage='add_to_root_cause', **fields):
+                for line_id, found_with_noise in candidates or []:
+                    root_cause_search.add_to_root_cause(line_id, found_with_noise, strategy)
+
+        # Share of the injected root cause contents, which are found by the search. The search reports the first line
+        # with a content in the time window, which can belong to an earlier occurrence of the error, if the occurrences
+        # are closer to each other than the time window. So the contents are compared instead of the line ids.
+        log_messages = root_cause_search.log_messages
+        found_contents = {str(entry.message['content']) for entry in root_cause_search.root_cause}
+        root_cause_contents = {
+            str(log_messages.get_by_id(line_id)['content']) for line_id in error['root_cause_line_ids']
+        }
+        found_count = len(found_contents.intersection(root_cause_contents))
+        self.write({**result, 'stage': 'recall', 'recall': found_count / max(len(root_cause_contents), 1)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures the preparation and search on synthetic log datasets.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--services', type=int, default=20)
+    parser.add_argument('--templates', type=int, default=200)
+    parser.add_argument('--errors', type=int, default=5)
+    parser.add_argument('--error-recurrence', type=int, default=50)
+    parser.add_argument('--root-cause-length', type=int, default=2)
+    parser.add_argument('--mean-gap-ms', type=float, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--searches', type=int, default=5, help='Number of errors searched for each dataset size')
+    parser.add_argument('--window-seconds', type=int, default=2)
+    parser.add_argument(
+        '--benchmark', choices=['pipeline', 'noise_counting'], default='pipeline',
+        help='Measure the preparation and searches, or only the counting of values outside the time windows'
+    )
+    parser.add_argument('--occurrences', type=int, nargs='+', default=[10, 100, 1_000, 10_000, 100_000])
+    parser.add_argument('--filtering-max-occurrences', type=int, default=1_000)
+    parser.add_argument('--work-dir', default='benchmarks/data')
+    parser.add_argument('--results-file', default='benchmarks/results.jsonl')
+    parser.add_argument('--drain-config-file', default='drain3.ini')
+    args = parser.parse_args()
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    with Benchmark(args) as benchmark:
+        for rows in args.rows:
+            if args.benchmark == 'noise_counting':
+                benchmark.run_noise_counting(rows)
+            else:
+                benchmark.run_size(rows)
+
+
+if __name__ == '__main__':
+    main()
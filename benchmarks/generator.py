@@ -0,0 +1,149 @@
+import argparse
+import json
+import numpy as np
+import os
+import pandas as pd
+
+
+class SyntheticLogGenerator:
+    def __init__(
+            self,
+            rows: int,
+            services: int = 20,
+            templates: int = 200,
+            errors: int = 5,
+            error_recurrence: int = 50,
+            root_cause_length: int = 2,
+            mean_gap_ms: float = 5,
+            seed: int = 0
+    ):
+        # The same parameters always create the same log messages. Each of the error templates occurs error_recurrence
+        # times. Its root cause is the same sequence of root_cause_length log messages directly before each occurrence.
+        if errors * error_recurrence * (root_cause_length + 1) > rows:
+            raise ValueError('Not enough rows for the errors and their root causes.')
+
+        self.rows = rows
+        self.services = services
+        self.templates = templates
+        self.errors = errors
+        self.error_recurrence = error_recurrence
+        self.root_cause_length = root_cause_length
+        self.mean_gap_ms = mean_gap_ms
+        self.seed = seed
+
+        random = np.random.default_rng(seed)
+        self.template_texts = np.array([self.create_template_text(random, i) for i in range(templates)], dtype=object)
+        self.template_services = random.integers(0, services, templates)
+        self.template_weights = random.zipf(1.5, templates).astype(float)  # Few templates are very frequent
+        self.template_weights /= self.template_weights.sum()
+
+        # Error templates and the templates of their root causes are additional templates of rare events.
+        self.error_texts = [f'ERROR {self.create_template_text(random, i)} failed' for i in range(errors)]
+        self.root_cause_texts = [
+            [f'WARN cause {j} of error {i} {self.create_template_text(random, j)}' for j in range(root_cause_length)]
+            for i in range(errors)
+        ]
+        self.error_services = random.integers(0, services, errors)
+
+        # Line ids of all error occurrences. They do not overlap with each other or with the root causes of others.
+        slots = np.arange(root_cause_length, rows, root_cause_length + 1)
+        self.error_line_ids = np.sort(
+            random.choice(slots, errors * error_recurrence, replace=False).reshape(errors, error_recurrence), axis=1
+        )
+
+    @staticmethod
+    def create_template_text(random: np.random.Generator, number: int) -> str:
+        letters = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+        words = [''.join(random.choice(letters, random.integers(3, 9))) for _ in range(random.integers(2, 7))]
+        return f'{words[0]}{number} ' + ' '.join(words[1:])
+
+    def write(self, csv_file: str, chunk_size: int = 1_000_000):
+        with open(csv_file, 'w') as file:
+            file.write('line_id,timestamp,service,content\n')
+        timestamp = pd.Timestamp('2023-01-01').value
+        for start in range(0, self.rows, chunk_size):
+            chunk, timestamp = self.create_chunk(start, min(start + chunk_size, self.rows), timestamp)
+            chunk.to_csv(csv_file, mode='a', header=False, index=False)
+
+        with open(self.metadata_file(csv_file), 'w') as file:
+            json.dump(self.metadata(), file, indent=2)
+
+    def create_chunk(self, start: int, end: int, timestamp: int) -> tuple[pd.DataFrame, int]:
+        # Every chunk gets its own random numbers, so that chunks can be created independently.
+        random = np.random.default_rng([self.seed, start])
+        line_ids = np.arange(start, end)
+
+        gaps = random.exponential(self.mean_gap_ms * 1_000_000, end - start).astype(np.int64)
+        timestamps = timestamp + np.cumsum(gaps)
+
+        template_ids = random.choice(self.templates, end - start, p=self.template_weights)
+        values = random.integers(0, 1000, end - start).astype(str)
+        contents = self.template_texts[template_ids] + ' value ' + values.astype(object)
+        services = self.template_services[template_ids]
+
+        for error in range(self.errors):
+            for offset in range(self.root_cause_length + 1):
+                positions = self.error_line_ids[error] - offset
+                positions = positions[(positions >= start) & (positions < end)] - start
+                if offset == 0:
+                    contents[positions] = self.error_texts[error]
+                else:
+                    contents[positions] = self.root_cause_texts[error][self.root_cause_length - offset]
+                services[positions] = self.error_services[error]
+
+        chunk = pd.DataFrame({
+            'line_id': line_ids,
+            'timestamp': pd.to_datetime(timestamps).strftime('%Y-%m-%d %H:%M:%S.%f'),
+            'service': 'Service' + services.astype(str).astype(object),
+            'content': contents
+        })
+        return chunk, int(timestamps[-1])
+
+    def metadata(self) -> dict:
+        # The last occurrence of each error is searched. Its root cause are the log messages directly before it.
+        return {
+            'parameters': {
+                'rows': self.rows,
+                'services': self.services,
+                'templates': self.templates,
+                'errors': self.errors,
+                'error_recurrence': self.error_recurrence,
+                'root_cause_length': self.root_cause_length,
+                'mean_gap_ms': self.mean_gap_ms,
+                'seed': self.seed
+            },
+            'errors': [
+                {
+                    'line_id': int(line_ids[-1]),
+                    'root_cause_line_ids': [int(line_ids[-1]) - offset for offset in range(self.root_cause_length, 0, -1)]
+                }
+                for line_ids in self.error_line_ids
+            ]
+        }
+
+    @staticmethod
+    def metadata_file(csv_file: str) -> str:
+        return os.path.splitext(csv_file)[0] + '.errors.json'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Creates a deterministic synthetic log dataset as CSV file.')
+    parser.add_argument('csv_file')
+    parser.add_argument('--rows', type=int, required=True)
+    parser.add_argument('--services', type=int, default=20)
+    parser.add_argument('--templates', type=int, default=200)
+    parser.add_argument('--errors', type=int, default=5)
+    parser.add_argument('--error-recurrence', type=int, default=50)
+    parser.add_argument('--root-cause-length', type=int, default=2)
+    parser.add_argument('--mean-gap-ms', type=float, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    SyntheticLogGenerator(
+        args.rows, args.services, args.templates, args.errors, args.error_recurrence, args.root_cause_length,
+        args.mean_gap_ms, args.seed
+    ).write(args.csv_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_CAUSE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'root_cause')
+
+# Libraries, which are only needed for creating template clusters, parallel processing or progress bars. Pyarrow is
+# not checked, because pandas already imports it if it is installed.
+HEAVY_MODULES = ['drain3', 'jsonpickle', 'tqdm', 'multiprocessing', 'concurrent.futures.process']
+
+
+def run_child(args: argparse.Namespace):
+    # Runs in a new interpreter, so that no module is imported before. Pandas is imported first, because every code
+    # path needs it and its import time would hide the difference.
+    start_time = time.perf_counter()
+    import pandas
+    pandas_time = time.perf_counter()
+
+    sys.path.append(ROOT_CAUSE_DIR)
+    from output import DisplayNoOutput
+    from search import RootCauseSearch
+    from settings import SearchSettings, SearchStrategy
+    import_time = time.perf_counter()
+
+    settings = SearchSettings(
+        dataset_name=args.dataset_name,
+        source_csv_file=args.csv_file,
+        storage_dir=args.work_dir,
+        drain_config_file=args.drain_config_file,
+        strategies=[SearchStrategy()],
+        service_filter=[],
+        content_filter=[],
+        output=DisplayNoOutput()
+    )
+    root_cause_search = RootCauseSearch(settings)
+    if args.line_id is not None:
+        root_cause_search.search(args.line_id)
+    end_time = time.perf_counter()
+
+    print(json.dumps({
+        'pandas_seconds': pandas_time - start_time,
+        'import_seconds': import_time - pandas_time,
+        'total_seconds': end_time - start_time,
+        'modules': {module: module in sys.modules for module in HEAVY_MODULES}
+    }))
+
+
+def run_in_child(args: argparse.Namespace, csv_file: str, line_id: int = None) -> dict:
+    command = [
+        sys.executable, os.path.abspath(__file__), '--child', '--work-dir', args.work_dir,
+        '--drain-config-file', args.drain_config_file, '--dataset-name', args.dataset_name, '--csv-file', csv_file
+    ]
+    if line_id is not None:
+        command += ['--line-id', str(line_id)]
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures the startup of a search in an already prepared dataset.')
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--work-dir', default='benchmarks/data')
+    parser.add_argument('--results-file', default='benchmarks/results.jsonl')
+    parser.add_argument('--drain-config-file', default='drain3.ini')
+    parser.add_argument('--dataset-name', default=None)
+    parser.add_argument('--csv-file', default=None)
+    parser.add_argument('--line-id', type=int, default=None)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    # The generator imports pandas, so it is only imported in this process and not in the measured ones.
+    from generator import SyntheticLogGenerator
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    args.dataset_name = f'import_time_{args.rows}'
+    csv_file = os.path.join(args.work_dir, f'{args.dataset_name}.source.csv')
+    generator = SyntheticLogGenerator(args.rows)
+    if not os.path.isfile(csv_file):
+        generator.write(csv_file)
+
+    # The dataset is prepared once. The measured runs only reload it and search one error.
+    run_in_child(args, csv_file)
+    line_id = generator.metadata()['errors'][0]['line_id']
+    runs = [run_in_child(args, csv_file, line_id) for _ in range(args.repeat)]
+
+    result = {
+        'benchmark': 'import_time',
+        'rows': args.rows,
+        'import_seconds': statistics.median(run['import_seconds'] for run in runs),
+        'total_seconds': statistics.median(run['total_seconds'] for run in runs),
+        'pandas_seconds': statistics.median(run['pandas_seconds'] for run in runs),
+        'search_modules': [module for module, loaded in runs[0]['modules'].items() if loaded]
+    }
+    with open(args.results_file, 'a') as file:
+        file.write(json.dumps(result) + '\n')
+    print(json.dumps(result, indent=2))
+
+    # A search in a prepared dataset must not load any of the heavy libraries.
+    if len(result['search_modules']) > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+import numpy as np
+import pandas as pd
+import sys
+
+
+class SearchCache:
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.entry_bytes = {}
+        self.cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, create: Callable):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        self.misses += 1
+        value = create()
+        size = self.size_of(value)
+        if self.max_entries > 0 and size <= self.max_bytes:
+            self.entries[key] = value
+            self.entry_bytes[key] = size
+            self.cached_bytes += size
+            self.evict()
+
+        return value
+
+    def evict(self):
+        # Remove the least recently used entries until the cache is within its limits.
+        while len(self.entries) > self.max_entries or self.cached_bytes > self.max_bytes:
+            key, _ = self.entries.popitem(last=False)
+            self.cached_bytes -= self.entry_bytes.pop(key)
+
+    def clear(self):
+        self.entries.clear()
+        self.entry_bytes.clear()
+        self.cached_bytes = 0
+
+    def statistics(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self.entries),
+            'bytes': self.cached_bytes
+        }
+
+    def size_of(self, value) -> int:
+        if isinstance(value, (pd.Series, pd.Index)):
+            return int(value.memory_usage(deep=False))  # Values are shared with the dataset
+        if isinstance(value, np.ndarray):
+            return value.nbytes
+        if isinstance(value, (list, tuple)):
+            return sys.getsizeof(value) + sum(self.size_of(item) for item in value)
+        return sys.getsizeof(value)
+
+
+class ContentCache:
+    def __init__(self, max_entries: int):
+        # Values of the least recently used distinct contents, like their masked forms or template ids. The values of all
+        # contents, which are not cached, are created by one call, so that they can be created in worker processes.
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, contents: list, create: Callable[[list], list]) -> dict:
+        values = {}
+        missing = []
+        for content in dict.fromkeys(contents):
+            if content in self.entries:
+                self.entries.move_to_end(content)
+                values[content] = self.entries[content]
+            else:
+                missing.append(content)
+
+        self.hits += len(values)
+        self.misses += len(missing)
+        if len(missing) > 0:
+            created = dict(zip(missing, create(missing)))
+            values.update(created)
+            self.entries.update(created)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+        return values
+
+    def hit_rate(self) -> float:
+        return self.hits / max(self.hits + self.misses, 1)
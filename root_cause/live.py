@@ -0,0 +1,320 @@
+import io
+from messages import LogMessages
+import numpy as np
+import pandas as pd
+from parser import TemplateParser
+from preparation import DatasetPreparation
+from search import RootCauseEntry, RootCauseSearch
+from settings import SearchSettings
+import shutil
+import sys
+import threading
+import time
+
+
+class LiveLogTail:
+    column_types = {
+        'line_id': np.int64,
+        'timestamp': np.int64,
+        'content': np.int32,
+        'service': np.int32,
+        'template_id': np.int64,
+        'service_template_id': np.int64
+    }
+
+    def __init__(
+            self,
+            settings: SearchSettings,
+            source: str,
+            retention_seconds: float,
+            max_messages: int = 1_000_000,
+            batch_size: int = 10_000,
+            state_save_seconds: float = 60
+    ):
+        # The source is a CSV file, which is still written by another process, or "-" for the standard input. Only the
+        # log messages of the last seconds of the retention are kept. The retention should be longer than the time
+        # windows of the search strategies, so that earlier occurrences of an error can still be found.
+        self.settings = settings
+        self.source = source
+        self.retention = pd.Timedelta(seconds=retention_seconds)
+        self.max_messages = max_messages
+        self.batch_size = batch_size
+        self.state_save_seconds = state_save_seconds
+
+        # The kept log messages are the rows between kept_start and kept_end of the columns. Contents and services are
+        # stored as codes, which stay the same until unused values are removed. This increases the version of the codes.
+        self.columns = None
+        self.kept_start = 0
+        self.kept_end = 0
+        self.removed_count = 0  # Number of log messages removed before the first kept one
+        self.codes = {'content': {}, 'service': {}}
+        self.categories = {'content': [], 'service': []}
+        self.codes_version = 0
+        self.templates = {}  # Current template of each cluster id
+        self.lock = threading.Lock()
+        self.search_lock = threading.Lock()
+        self.file = None
+        self.header = None
+        self.partial_line = ''
+        self.parser = None
+        self.state_saved_time = None
+        self.last_line_id = None
+        self.last_timestamp = None
+        self.service_template_ids = {}
+        self.log_messages = None  # Snapshot of the messages, which is created again after new messages were added
+        self.previous_snapshot = None  # Last snapshot with the number of removed log messages and codes version
+        self.root_cause_search = None
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.skipped_lines_count = 0
+        self.error = None  # Error, which stopped reading the source
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        # The live log continues the template clusters of the prepared dataset in its own Drain state. The state is
+        # saved periodically instead of after each changed cluster, which would slow down reading new log messages.
+        if not self.settings.live_drain_state_file_exists() and self.settings.drain_state_file_file_exists():
+            shutil.copyfile(self.settings.drain_state_file, self.settings.live_drain_state_file)
+        self.parser = TemplateParser(
+            self.settings.drain_config_file, self.settings.live_drain_state_file, save_changes=False
+        )
+        self.state_saved_time = time.monotonic()
+
+        if self.source == '-':
+            self.file = sys.stdin
+        else:
+            self.file = open(self.source, 'r')
+
+    def close(self):
+        self.stop()
+        if self.file is not None and self.file is not sys.stdin:
+            self.file.close()
+        self.file = None
+        if self.parser is not None:
+            self.parser.save_state()
+
+    def start(self, poll_seconds: float = 0.5):
+        # New log messages are read in a background thread, while searches can be run at any moment.
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.follow, args=(poll_seconds,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def follow(self, poll_seconds: float = 0.5):
+        # An error while reading the source stops following it. It is raised again by the next search, so that searches
+        # are not answered silently from log messages, which are not updated anymore.
+        try:
+            while not self.stop_event.is_set():
+                read_count = self.poll()
+                if time.monotonic() - self.state_saved_time >= self.state_save_seconds:
+                    self.parser.save_state()
+                    self.state_saved_time = time.monotonic()
+                if read_count == 0:
+                    self.stop_event.wait(poll_seconds)
+        except Exception as error:
+            self.error = error
+            self.settings.output.print_status(f'Reading the live log stopped: {error!r}')
+
+    def poll(self) -> int:
+        # Reads the complete lines written since the last call. A line without line break is still being written.
+        lines = []
+        while len(lines) < self.batch_size:
+            line = self.file.readline()
+            if line == '':
+                break
+
+            line = self.partial_line + line
+            self.partial_line = ''
+            if not line.endswith('\n'):
+                self.partial_line = line
+                break
+
+            if self.header is None:
+                self.header = line
+            elif line.strip() != '':
+                lines.append(line)
+
+        if len(lines) == 0:
+            return 0
+
+        self.add_valid(lines)
+        return len(lines)
+
+    def add_valid(self, lines: list[str]):
+        # If lines can not be added, both halves of them are added separately. So only the malformed or out of order
+        # lines are skipped, instead of their whole batch or stopping the live log.
+        try:
+            self.add(lines)
+        except Exception as error:
+            if len(lines) > 1:
+                self.add_valid(lines[:len(lines) // 2])
+                self.add_valid(lines[len(lines) // 2:])
+                return
+
+            self.skipped_lines_count += 1
+            self.settings.output.print_status(f'Live log line skipped ({self.skipped_lines_count} in total): {error!r}')
+
+    def add(self, lines: list[str]):
+        # The lines are read and prepared with the header of the source, like the lines of a dataset.
+        log_messages = LogMessages(pd.read_csv(io.StringIO(self.header + ''.join(lines)), index_col='line_id'))
+        DatasetPreparation.prepare_log_messages(log_messages, self.last_timestamp)
+        # The order is checked for each log message, because the kept timestamps must stay sorted for the eviction.
+        index, timestamps = log_messages.log_messages.index, log_messages.log_messages['timestamp']
+        if self.last_line_id is not None and index.min() <= self.last_line_id or not index.is_monotonic_increasing:
+            raise ValueError('Line ids of the live log messages must be increasing.')
+        if not timestamps.is_monotonic_increasing:
+            raise ValueError('Timestamps of the live log messages must be in ascending order.')
+
+        # The cluster ids are the template ids. Only the templates of the clusters of these log messages can change.
+        dataframe = log_messages.log_messages
+        dataframe['template_id'] = [self.parser.add_log_message(content) for content in dataframe['content']]
+        templates = {
+            cluster_id: self.parser.get_cluster_template(cluster_id) for cluster_id in dataframe['template_id'].unique()
+        }
+        self.service_template_ids = log_messages.add_service_template_ids(self.service_template_ids)
+
+        with self.lock:
+            self.templates.update(templates)
+            self.reserve(len(dataframe))
+            rows = {
+                'line_id': dataframe.index.to_numpy(dtype=np.int64),
+                'timestamp': dataframe['timestamp'].to_numpy(dtype='datetime64[ns]').view('int64'),
+                'content': self.encode('content', dataframe['content']),
+                'service': self.encode('service', dataframe['service']),
+                'template_id': dataframe['template_id'].to_numpy(dtype=np.int64),
+                'service_template_id': dataframe['service_template_id'].to_numpy(dtype=np.int64)
+            }
+            for name, values in rows.items():
+                self.columns[name][self.kept_end:self.kept_end + len(values)] = values
+            self.kept_end += len(dataframe)
+            self.last_line_id = dataframe.index.max()
+            self.last_timestamp = dataframe.iloc[-1]['timestamp']
+            self.evict()
+            self.log_messages = None
+
+    def encode(self, column: str, values: pd.Series) -> np.ndarray:
+        # Codes of the values. New values get the next codes and missing values the code -1.
+        value_codes, uniques = pd.factorize(values)
+        codes, categories = self.codes[column], self.categories[column]
+        for value in uniques:
+            if value not in codes:
+                codes[value] = len(categories)
+                categories.append(value)
+        return np.append(np.array([codes[value] for value in uniques], dtype=np.int32), -1)[value_codes]
+
+    def reserve(self, count: int):
+        # When the columns are full, the kept rows are moved into new columns with space for as many rows again.
+        if self.columns is not None and self.kept_end + count <= len(self.columns['line_id']):
+            return
+
+        kept_count = self.kept_end - self.kept_start
+        capacity = max(2 * (kept_count + count), self.batch_size)
+        columns = {}
+        for name, dtype in LiveLogTail.column_types.items():
+            columns[name] = np.empty(capacity, dtype=dtype)
+            if self.columns is not None:
+                columns[name][:kept_count] = self.columns[name][self.kept_start:self.kept_end]
+        self.columns = columns
+        self.kept_start, self.kept_end = 0, kept_count
+        self.remove_unused_values()
+
+    def remove_unused_values(self):
+        # Contents of removed log messages are not kept forever. If less than half of the values are still used, they
+        # get new codes.
+        for column in ['content', 'service']:
+            codes = self.columns[column][self.kept_start:self.kept_end]
+            used = np.bincount(codes[codes >= 0], minlength=len(self.categories[column])) > 0
+            if used.sum() >= len(used) / 2:
+                continue
+
+            new_codes = np.append(np.cumsum(used) - 1, -1)
+            self.columns[column][self.kept_start:self.kept_end] = new_codes[codes]
+            self.categories[column] = [value for value, is_used in zip(self.categories[column], used) if is_used]
+            self.codes[column] = {value: code for code, value in enumerate(self.categories[column])}
+            self.codes_version += 1
+
+    def evict(self):
+        # Remove log messages, which are older than the retention before the newest log message, and the oldest log
+        # messages above the maximum number of them. The timestamps are in ascending order.
+        timestamps = self.columns['timestamp'][self.kept_start:self.kept_end]
+        removed_count = int(np.searchsorted(timestamps, (self.last_timestamp - self.retention).value, side='left'))
+        removed_count = max(removed_count, len(timestamps) - self.max_messages)
+        self.kept_start += removed_count
+        self.removed_count += removed_count
+
+    def snapshot(self) -> LogMessages:
+        # The snapshot is reused by all searches until new log messages arrive.
+        if self.error is not None:
+            raise RuntimeError('Reading the live log stopped.') from self.error
+        with self.lock:
+            if self.log_messages is None:
+                self.log_messages = self.create_log_messages()
+            return self.log_messages
+
+    def create_log_messages(self) -> LogMessages:
+        # The snapshot gets copies of the kept rows, because the columns are changed by reading new log messages.
+        if self.kept_end == self.kept_start:
+            raise ValueError('No live log messages received yet.')
+
+        rows = {name: values[self.kept_start:self.kept_end].copy() for name, values in self.columns.items()}
+        dataframe = pd.DataFrame({
+            'timestamp': rows['timestamp'].view('datetime64[ns]'),
+            'content': pd.Categorical.from_codes(rows['content'], pd.Index(self.categories['content'], dtype=object)),
+            'service': pd.Categorical.from_codes(rows['service'], pd.Index(self.categories['service'], dtype=object)),
+            'template_id': self.integer_array(rows['template_id']),
+            'service_template_id': self.integer_array(rows['service_template_id'])
+        }, index=pd.Index(rows['line_id'], name='line_id'))
+
+        # All log messages get the current template of their cluster. Template ids and service template ids are
+        # numbered from 1, so their codes are the ids minus 1 in all snapshots.
+        log_messages = LogMessages(dataframe)
+        log_messages.templates = pd.Series(self.templates, dtype=object)
+        log_messages.set_value_codes('template_id', rows['template_id'] - 1, pd.RangeIndex(1, max(self.templates) + 1))
+        log_messages.set_value_codes(
+            'service_template_id', rows['service_template_id'] - 1, pd.RangeIndex(1, len(self.service_template_ids) + 1)
+        )
+
+        # The value indexes, which were created by searches in the previous snapshot, are continued instead of sorting
+        # all rows again.
+        if self.previous_snapshot is not None:
+            previous, removed_count, codes_version = self.previous_snapshot
+            removed_count = self.removed_count - removed_count
+            if codes_version == self.codes_version and removed_count <= len(previous.log_messages):
+                for column in previous.value_indexes:
+                    log_messages.continue_value_index(column, previous, removed_count)
+        self.previous_snapshot = (log_messages, self.removed_count, self.codes_version)
+
+        return log_messages
+
+    @staticmethod
+    def integer_array(values: np.ndarray) -> pd.arrays.IntegerArray:
+        # The ids are already in the nullable data type of LogMessages, which avoids checking each of them for missing
+        # values again.
+        return pd.arrays.IntegerArray(values, np.zeros(len(values), dtype=bool))
+
+    def search(self, error_line_id: int) -> list[RootCauseEntry]:
+        with self.search_lock:
+            return self.get_root_cause_search().search(error_line_id)
+
+    def search_many(self, error_line_ids: list[int]) -> dict[int, list[RootCauseEntry]]:
+        with self.search_lock:
+            return self.get_root_cause_search().search_many(error_line_ids)
+
+    def get_root_cause_search(self) -> RootCauseSearch:
+        log_messages = self.snapshot()
+        if self.root_cause_search is None:
+            self.root_cause_search = RootCauseSearch(self.settings, log_messages)
+        else:
+            self.root_cause_search.use_log_messages(log_messages)
+        return self.root_cause_search
@@ -1,12 +1,13 @@
 from collections.abc import Callable
 from datetime import datetime
-import os
-from pandarallel import pandarallel
+import itertools
+import numpy as np
 import pandas as pd
-from tqdm.auto import tqdm
 
 
 class LogMessages:
+    versions = itertools.count(1)
+
     def __init__(self, dataframe: pd.DataFrame):
         self.log_messages = dataframe
 
@@ -14,9 +15,33 @@ class LogMessages:
         if 'timestamp' in self.log_messages.columns:
             self.log_messages['timestamp'] = pd.to_datetime(self.log_messages['timestamp'])
 
-        self.required_columns = ['timestamp', 'content', 'service', 'template', 'service_template_id']
-        self.pandarallel_initialized = False
+        self.required_columns = ['timestamp', 'content', 'service', 'template_id', 'service_template_id']
+        self.templates = pd.Series(dtype=object)  # Template of each template id
         self.tqdm_initialized = False
+        self.reset_indexes()
+        self.version = next(LogMessages.versions)  # Identifies the data in caches of search results
+
+    def encode_columns(self):
+        # Services, templates and many contents repeat very often. As categoricals each row only holds an integer code.
+        columns = [column for column in ['content', 'service', 'template'] if column in self.log_messages.columns]
+        self.log_messages = self.log_messages.astype({column: 'category' for column in columns})
+        self.reset_indexes()
+
+    @property
+    def template_column(self) -> str:
+        # Datasets prepared before the templates were stored as ids contain the template of each log message.
+        if 'template_id' not in self.log_messages.columns and 'template' in self.log_messages.columns:
+            return 'template'
+        return 'template_id'
+
+    def reset_indexes(self):
+        self.timestamp_index = None
+        self.value_codes = {}
+        self.value_categories = {}  # Distinct value of each code
+        self.value_indexes = {}
+
+    def memory_usage(self) -> int:
+        return int(self.log_messages.memory_usage(deep=True).sum())
 
     def normalize_column_names(self):
         self.log_messages.columns = self.log_messages.columns.str.strip()
@@ -28,10 +53,66 @@ class LogMessages:
         return self.log_messages.loc[line_id]
 
     def get_by_value(self, column: str, value) -> pd.DataFrame:
-        return self.log_messages.loc[self.log_messages[column] == value]
-
-    def to_csv(self, csv_file: str):
-        self.log_messages.to_csv(csv_file, index_label='line_id')
+        return self.log_messages.iloc[self.value_positions(column, value)]
+
+    def get_timestamps_by_value(self, column: str, value) -> pd.Series:
+        return self.log_messages['timestamp'].iloc[self.value_positions(column, value)]
+
+    def value_positions(self, column: str, value) -> np.ndarray:
+        # Positions of the rows with the value in ascending order. They are looked up in the value index instead of
+        # comparing the value with all rows.
+        offsets, positions = self.get_value_index(column)
+        try:
+            code = self.value_categories[column].get_loc(value)
+        except KeyError:
+            return positions[:0]
+        return positions[offsets[code]:offsets[code + 1]]
+
+    def matching_rows(self, column: str, matches: Callable[[pd.Series], np.ndarray]) -> np.ndarray:
+        # Mask of the rows with a matching value. Each distinct value is only matched once. Missing values never match.
+        codes = self.get_value_codes(column)
+        matched = matches(pd.Series(self.value_categories[column]))
+        return np.append(matched, False)[codes]
+
+    def to_csv(self, csv_file: str, append: bool = False):
+        if append:
+            self.log_messages.to_csv(csv_file, index_label='line_id', mode='a', header=False)
+        else:
+            self.log_messages.to_csv(csv_file, index_label='line_id')
+
+    def append(self, log_messages: 'LogMessages'):
+        # Categorical columns get the new values as additional categories. This keeps the codes of the existing rows.
+        appended = log_messages.log_messages
+        for column in self.log_messages.columns:
+            if isinstance(self.log_messages[column].dtype, pd.CategoricalDtype):
+                categories = self.log_messages[column].cat.categories
+                new_categories = pd.Index(appended[column].dropna().unique()).difference(categories)
+                self.log_messages[column] = self.log_messages[column].cat.add_categories(new_categories)
+                appended = appended.astype({column: self.log_messages[column].dtype})
+
+        self.log_messages = pd.concat([self.log_messages, appended])
+        self.reset_indexes()
+        self.version = next(LogMessages.versions)
+
+    def service_template_ids(self) -> dict:
+        # Ids of the unordered pairs of service and template, as created by add_service_template_ids.
+        pairs = self.log_messages[['service', self.template_column, 'service_template_id']].drop_duplicates()
+        return {frozenset((service, template)): pair_id for service, template, pair_id in pairs.itertuples(index=False)}
+
+    def to_file(self, file: str):
+        if file.endswith('.csv'):
+            self.to_csv(file)
+            return
+
+        # Columnar formats keep the data types, so services and templates are stored as dictionary encoded columns.
+        categories = {column: 'category' for column in ['service', 'template'] if column in self.log_messages.columns}
+        log_messages = self.log_messages.astype(categories).rename_axis('line_id')
+        if file.endswith('.parquet'):
+            log_messages.to_parquet(file)
+        elif file.endswith('.feather'):
+            log_messages.reset_index().to_feather(file)
+        else:
+            raise ValueError(f'Unknown file format of {file}.')
 
     def create_empty_column(self, column: str, default_value):
         self.log_messages[column] = default_value
@@ -45,51 +126,24 @@ class LogMessages:
 
     def init_tqdm(self):
         if not self.tqdm_initialized:
+            from tqdm.auto import tqdm
             tqdm.pandas()  # Shows progress bar
             self.tqdm_initialized = True
 
-    def parallel_apply_on_rows(self, func: Callable, parallel_processing: bool, show_progress: bool, *args, **kwargs):
-        chunk_size = 2_000_000
-        messsages_count = len(self.log_messages)
-        if chunk_size > messsages_count:
-            chunk_size = messsages_count
-
-        if parallel_processing:
-            self.init_pandarallel(show_progress)
-            for i in range(0, messsages_count, chunk_size):
-                self.log_messages.iloc[i:i + chunk_size] = self.log_messages.iloc[i:i + chunk_size].parallel_apply(
-                    func,
-                    args=args,
-                    **kwargs,
-                    axis=1
-                )
-        else:
-            if show_progress:
-                self.init_tqdm()
-            for i in range(0, messsages_count, chunk_size):
-                self.log_messages.iloc[i:i + chunk_size] = self.log_messages.iloc[i:i + chunk_size].progress_apply(
-                    func,
-                    args=args,
-                    **kwargs,
-                    axis=1
-                )
-
-    def init_pandarallel(self, show_progress: bool):
-        if not self.pandarallel_initialized:
-            os.environ['JOBLIB_TEMP_FOLDER'] = '/tmp'
-            pandarallel.initialize(
-                nb_workers=int(os.cpu_count()) - 1,
-                progress_bar=show_progress,
-                use_memory_fs=False,
-                verbose=1
-            )
-            self.pandarallel_initialized = True
+    def map_unique_values(self, column: str, target_column: str, func: Callable[[list], list]) -> int:
+        # The function gets each distinct value only once. Its results are then mapped to all rows.
+        values = self.log_messages[column].unique()
+        results = pd.Series(func(list(values)), index=values)
+        self.log_messages[target_column] = self.log_messages[column].map(results)
+        return len(values)
 
     def ensure_required_columns_exist(self, template: bool):
         required = self.required_columns.copy()
         if not template:
-            required.remove('template')
+            required.remove('template_id')
             required.remove('service_template_id')
+        elif self.template_column == 'template':
+            required[required.index('template_id')] = 'template'
 
         for column in required:
             if not column in self.log_messages.columns:
@@ -104,55 +158,198 @@ class LogMessages:
             self.log_messages['timestamp'] = self.log_messages['day'] + ' ' + self.log_messages['time']
 
     def validate_timestamp_format(self):
-        datetime.strptime(str(self.log_messages.iloc[0]['timestamp']), '%Y-%m-%d %H:%M:%S.%f')
-
-    def validate_timestamp_order(self):
-        if self.log_messages.iloc[0]['timestamp'] > self.log_messages.iloc[-1]['timestamp']:
+        # Parsed timestamps without fractional seconds are shown without them, although the source has the format.
+        timestamp = self.log_messages.iloc[0]['timestamp']
+        if isinstance(timestamp, pd.Timestamp):
+            return
+        datetime.strptime(str(timestamp), '%Y-%m-%d %H:%M:%S.%f')
+
+    def validate_timestamp_order(self, previous_timestamp=None):
+        # The previous timestamp is the last one of data, which is continued by these log messages.
+        first_timestamp = self.log_messages.iloc[0]['timestamp']
+        if previous_timestamp is not None and pd.Timestamp(previous_timestamp) > pd.Timestamp(first_timestamp):
+            raise ValueError('Timestamps are not in descending order.')
+        if first_timestamp > self.log_messages.iloc[-1]['timestamp']:
             raise ValueError('Timestamps are not in descending order.')
 
-    def add_service_template_ids(self):
-        self.log_messages['service_template_id'] = self.log_messages.groupby(
-            self.log_messages[['service', 'template']].apply(frozenset, axis=1)
-        ).ngroup() + 1
+    def add_service_template_ids(self, known_ids: dict = None) -> dict:
+        # Rows are grouped by the unordered pair of service and template id. Both columns are factorized to integer
+        # codes, so the pair of each row is a single integer and only the distinct pairs are combined as sets. Pairs in
+        # the known ids keep their id, which allows to assign the ids chunk by chunk.
+        service_codes, _ = pd.factorize(self.log_messages['service'], use_na_sentinel=False)
+        template_codes, _ = pd.factorize(self.log_messages[self.template_column], use_na_sentinel=False)
+        pair_codes, _ = pd.factorize(service_codes * (template_codes.max(initial=0) + 1) + template_codes)
+        _, first_rows = np.unique(pair_codes, return_index=True)
 
-    def count_outside_time_windows(self, column: str, end_times: pd.Series, seconds: int) -> pd.Series:
-        end_times = end_times.to_list()
-        end_times.append(self.log_messages['timestamp'].max())  # Add last timestamp of data to end_times just in case.
-        log_messages = self.log_messages
+        pairs = self.log_messages[['service', self.template_column]].iloc[first_rows]
+        pairs = [frozenset(pair) for pair in pairs.itertuples(index=False)]
 
-        for end_time in end_times:
-            start_time = end_time - pd.Timedelta(seconds=seconds)
-            log_messages = log_messages[
-                (log_messages['timestamp'] < start_time) | (log_messages['timestamp'] > end_time)
-                ]
+        # New pairs are numbered in the same order as a groupby of the pairs of all rows, which sorts the sets in the
+        # order of their first occurrence with the same sort.
+        ids = {} if known_ids is None else known_ids.copy()
+        new_pairs = pd.Series([pair for pair in dict.fromkeys(pairs) if pair not in ids], dtype=object)
+        new_pair_ids, _ = pd.factorize(new_pairs, sort=True)
+        ids.update(zip(new_pairs, (new_pair_ids + len(ids) + 1).tolist()))
 
-        return log_messages[column].value_counts()
+        row_ids = np.array([ids[pair] for pair in pairs], dtype=np.int64)[pair_codes]
+        self.log_messages['service_template_id'] = pd.array(row_ids, dtype='Int64')  # Same data type as after reloading
 
-    def time_windows_intersection(self, column: str, end_times: pd.Series, seconds: int) -> list:
-        windows = self.time_windows(end_times, seconds)
+        return ids
 
-        if len(windows) == 0:
+    def count_outside_time_windows(self, column: str, end_times: pd.Series, seconds: int) -> pd.Series:
+        timestamps, order = self.get_timestamp_index()
+
+        # Add last timestamp of data to end_times just in case.
+        end_times = np.append(end_times.to_numpy(dtype='datetime64[ns]').view('int64'), timestamps[-1])
+        end_times = np.sort(end_times)
+        start_times = end_times - pd.Timedelta(seconds=seconds).value
+
+        # All windows have the same length, so after sorting a window overlaps the previous one if it starts before
+        # the previous one ends. Overlapping windows are merged into one.
+        new_window = start_times[1:] > end_times[:-1]
+        starts, ends = self.time_window_positions(
+            start_times[np.append(True, new_window)], end_times[np.append(new_window, True)]
+        )
+
+        # Sweep over the merged windows to mark every row inside one of them.
+        sweep = np.zeros(len(timestamps) + 1, dtype=np.int64)
+        np.add.at(sweep, starts, 1)
+        np.add.at(sweep, ends, -1)
+        inside = np.cumsum(sweep[:-1]) > 0
+        if order is not None:
+            inside[order] = inside.copy()
+
+        counts = self.log_messages[column][~inside].value_counts()
+        return counts[counts > 0]  # Categorical columns also count categories that do not occur
+
+    def time_windows_intersection(self, column: str, end_times: pd.Series, seconds: int, min_values: int = 1) -> list:
+        # The intersection is created from the integer codes of the distinct values in each time window. It stops
+        # early, if less than min_values values are left.
+        end_times = end_times.to_numpy(dtype='datetime64[ns]').view('int64')
+        starts, ends = self.time_window_positions(end_times - pd.Timedelta(seconds=seconds).value, end_times)
+
+        if len(starts) == 0:
             return []
-        if len(windows) == 1:
-            return windows[0][column].to_list()
-
-        on = [column]
-        intersection = windows[0][on]
-        for dataframe in windows[1:]:
-            intersection = intersection.merge(dataframe[on], on=on, how='inner').drop_duplicates()
-
-        return intersection[column].to_list()
+        first_window = self.rows_between_positions(starts[0], ends[0])[column]
+        if len(starts) == 1:
+            return first_window.to_list()
+
+        codes = self.get_value_codes(column)
+        intersection = np.unique(self.codes_between_positions(codes, starts[0], ends[0]))
+        for start, end in zip(starts[1:], ends[1:]):
+            if len(intersection) < min_values:
+                break
+            window_codes = np.unique(self.codes_between_positions(codes, start, end))
+            intersection = np.intersect1d(intersection, window_codes, assume_unique=True)
+
+        # Keep the order in which the values appear in the first time window.
+        first_window_codes = self.codes_between_positions(codes, starts[0], ends[0], keep_order=True)
+        return first_window[np.isin(first_window_codes, intersection)].drop_duplicates().to_list()
 
     def time_windows(self, end_times: pd.Series, seconds: int) -> list[pd.DataFrame]:
-        windows = []
-        for end_time in end_times:
-            windows.append(self.time_window(end_time, seconds))
+        end_times = end_times.to_numpy(dtype='datetime64[ns]').view('int64')
+        starts, ends = self.time_window_positions(end_times - pd.Timedelta(seconds=seconds).value, end_times)
 
-        return windows
+        return [self.rows_between_positions(start, end) for start, end in zip(starts, ends)]
 
     def time_window(self, end_time: pd.Timestamp, seconds: int) -> pd.DataFrame:
-        start_time = end_time - pd.Timedelta(seconds=seconds)
-
-        return self.log_messages[
-            (self.log_messages['timestamp'] >= start_time) & (self.log_messages['timestamp'] <= end_time)
-            ]
+        end_time = pd.Timestamp(end_time).value
+        starts, ends = self.time_window_positions(
+            np.array([end_time - pd.Timedelta(seconds=seconds).value]), np.array([end_time])
+        )
+
+        return self.rows_between_positions(starts[0], ends[0])
+
+    def time_window_positions(self, start_times: np.ndarray, end_times: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # Binary search in the sorted timestamps. Both window boundaries are inclusive.
+        timestamps, _ = self.get_timestamp_index()
+        return (
+            np.searchsorted(timestamps, start_times, side='left'),
+            np.searchsorted(timestamps, end_times, side='right')
+        )
+
+    def rows_between_positions(self, start: int, end: int) -> pd.DataFrame:
+        _, order = self.get_timestamp_index()
+        if order is None:
+            return self.log_messages.iloc[start:end]  # Zero-copy slice for data in timestamp order
+        return self.log_messages.iloc[np.sort(order[start:end])]
+
+    def codes_between_positions(self, codes: np.ndarray, start: int, end: int, keep_order: bool = False) -> np.ndarray:
+        _, order = self.get_timestamp_index()
+        if order is None:
+            return codes[start:end]
+        if keep_order:
+            return codes[np.sort(order[start:end])]
+        return codes[order[start:end]]
+
+    def create_indexes(self, columns: list[str]):
+        # Indexes are otherwise created by the first search that needs them. Creating them beforehand lets concurrent
+        # searches share them without creating them twice.
+        self.get_timestamp_index()
+        for column in columns:
+            self.get_value_index(column)
+
+    def get_value_codes(self, column: str) -> np.ndarray:
+        # Integer code for each distinct value of the column. The same value always gets the same code.
+        if column not in self.value_codes:
+            if isinstance(self.log_messages[column].dtype, pd.CategoricalDtype):
+                self.value_codes[column] = self.log_messages[column].cat.codes.to_numpy()
+                self.value_categories[column] = self.log_messages[column].cat.categories
+            else:
+                self.value_codes[column], uniques = pd.factorize(self.log_messages[column])
+                self.value_categories[column] = pd.Index(uniques)
+
+        return self.value_codes[column]
+
+    def set_value_codes(self, column: str, codes: np.ndarray, categories: pd.Index):
+        # Codes, which are kept the same for the values of a column across several log messages, e.g. of a live log.
+        self.value_codes[column] = codes
+        self.value_categories[column] = categories
+
+    def continue_value_index(self, column: str, previous: 'LogMessages', removed_count: int):
+        # Value index created from the index of previous log messages, which have the same codes for the values. These
+        # log messages are the previous ones without their first removed_count rows and continued by new rows. The new
+        # rows come after the remaining rows of each value, so they are merged into the index instead of sorting again.
+        offsets, positions = previous.get_value_index(column)
+        codes = self.get_value_codes(column)
+        kept_count = len(previous.log_messages) - removed_count
+
+        previous_codes = np.repeat(np.arange(-1, len(offsets) - 1), np.diff(offsets, prepend=0))
+        kept = positions >= removed_count
+        kept_codes, kept_positions = previous_codes[kept], positions[kept] - removed_count
+
+        new_positions = np.argsort(codes[kept_count:], kind='stable') + kept_count
+        new_codes = codes[new_positions]
+        insert_positions = np.searchsorted(kept_codes, new_codes, side='right')
+        positions = np.insert(kept_positions, insert_positions, new_positions).astype(kept_positions.dtype)
+        sorted_codes = np.insert(kept_codes, insert_positions, new_codes)
+
+        offsets = np.searchsorted(sorted_codes, np.arange(len(self.value_categories[column]) + 1))
+        self.value_indexes[column] = (offsets, positions)
+
+    def get_value_index(self, column: str) -> tuple[np.ndarray, np.ndarray]:
+        # Row positions sorted by the code of their value, and for each code the offset of its first position. Missing
+        # values have the code -1 and are sorted before all others. The data does not change after the preparation,
+        # so the index is created only once.
+        if column not in self.value_indexes:
+            codes = self.get_value_codes(column)
+            positions = np.argsort(codes, kind='stable')
+            if len(positions) < np.iinfo(np.int32).max:
+                positions = positions.astype(np.int32)
+            offsets = np.searchsorted(codes[positions], np.arange(len(self.value_categories[column]) + 1))
+            self.value_indexes[column] = (offsets, positions)
+
+        return self.value_indexes[column]
+
+    def get_timestamp_index(self) -> tuple[np.ndarray, np.ndarray]:
+        # Timestamps as sorted int64 nanoseconds. The order of the rows is only needed, if the dataset contains
+        # timestamps that are not in ascending order.
+        if self.timestamp_index is None:
+            timestamps = self.log_messages['timestamp'].to_numpy(dtype='datetime64[ns]').view('int64')
+            if np.all(timestamps[:-1] <= timestamps[1:]):
+                self.timestamp_index = (timestamps, None)
+            else:
+                order = np.argsort(timestamps, kind='stable')
+                self.timestamp_index = (timestamps[order], order)
+
+        return self.timestamp_index
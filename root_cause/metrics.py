@@ -0,0 +1,73 @@
+from contextlib import contextmanager, nullcontext
+import time
+import tracemalloc
+
+
+class Metrics:
+    def __init__(self, name: str, track_memory: bool = False, **fields):
+        # Seconds, calls and peak memory of each phase. Nested phases are named by the path of their parent phases.
+        self.name = name
+        self.fields = fields
+        self.track_memory = track_memory
+        self.phases = {}
+        self.stack = []
+        self.started_tracing = False
+
+    @staticmethod
+    def for_output(output, name: str, **fields) -> 'Metrics':
+        # Outputs without metrics get phases without any measurement, so that they do not slow down the search.
+        if not output.collects_metrics():
+            return NoMetrics(name, **fields)
+        return Metrics(name, output.tracks_memory(), **fields)
+
+    @contextmanager
+    def phase(self, name: str):
+        path = '/'.join([entry['path'] for entry in self.stack[-1:]] + [name])
+        entry = {'path': path, 'peak': 0}
+        if self.track_memory:
+            self.start_memory_tracking(entry)
+        self.stack.append(entry)
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start_time
+            self.stack.pop()
+            phase = self.phases.setdefault(path, {'seconds': 0.0, 'calls': 0})
+            phase['seconds'] += seconds
+            phase['calls'] += 1
+            if self.track_memory:
+                self.stop_memory_tracking(entry, phase)
+
+    def start_memory_tracking(self, entry: dict):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+        # The peak is reset for each phase. The parent phase keeps the peak it reached before.
+        current, peak = tracemalloc.get_traced_memory()
+        if len(self.stack) > 0:
+            self.stack[-1]['peak'] = max(self.stack[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+        entry['start'] = current
+
+    def stop_memory_tracking(self, entry: dict, phase: dict):
+        _, peak = tracemalloc.get_traced_memory()
+        entry['peak'] = max(entry['peak'], peak)
+        phase['peak_bytes'] = max(phase.get('peak_bytes', 0), entry['peak'] - entry['start'])
+
+        if len(self.stack) == 0 and self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def to_dict(self) -> dict:
+        return {'name': self.name, **self.fields, 'phases': self.phases}
+
+
+class NoMetrics(Metrics):
+    def __init__(self, name: str, **fields):
+        super().__init__(name, **fields)
+        self.no_phase = nullcontext()
+
+    def phase(self, name: str):
+        return self.no_phase
@@ -0,0 +1,209 @@
+import argparse
+import copy
+import json
+from messages import LogMessages
+import numpy as np
+from output import DisplayNoOutput, DisplayNotebookOutput
+import os
+import pandas as pd
+from search import RootCauseSearch
+from settings import FilterPattern, parse_strategy, SearchSettings, SearchStrategy
+
+
+class PresenceIndex:
+    def __init__(self, log_messages: LogMessages, column: str, bucket_seconds: float, chunk_size: int = 1_000_000):
+        # Time buckets in which each value of the column occurs, as sorted keys of the value code and the bucket. The
+        # index grows with the number of distinct pairs of value and bucket instead of the number of log messages. It
+        # is created chunk by chunk, so that only the keys of one chunk are held besides the index.
+        self.column = column
+        self.bucket_length = pd.Timedelta(seconds=bucket_seconds).value
+        codes = log_messages.get_value_codes(column)
+        timestamps = log_messages.log_messages['timestamp'].to_numpy(dtype='datetime64[ns]').view('int64')
+        self.first_timestamp = timestamps.min(initial=0)
+        self.buckets_count = int(self.bucket(timestamps.max(initial=0))) + 1
+
+        self.keys = np.empty(0, dtype=np.int64)
+        for start in range(0, len(codes), chunk_size):
+            chunk_codes = codes[start:start + chunk_size].astype(np.int64)
+            chunk_buckets = self.bucket(timestamps[start:start + chunk_size])
+            chunk_keys = chunk_codes[chunk_codes >= 0] * self.buckets_count + chunk_buckets[chunk_codes >= 0]
+            self.keys = np.union1d(self.keys, chunk_keys)
+        self.values_count = len(log_messages.value_categories[column])
+
+    def bucket(self, timestamps: np.ndarray) -> np.ndarray:
+        return np.maximum(timestamps - self.first_timestamp, 0) // self.bucket_length
+
+    def present_in_all_windows(self, end_times: pd.Series, seconds: int, min_values: int = 1) -> np.ndarray:
+        # Codes of the values, which occur in a bucket overlapping each of the time windows. They contain all values of
+        # the exact intersection of the time windows. It stops early, if less than min_values values are left.
+        end_times = end_times.to_numpy(dtype='datetime64[ns]').view('int64')
+        first_buckets = self.bucket(end_times - pd.Timedelta(seconds=seconds).value)
+        last_buckets = self.bucket(end_times)
+
+        codes = np.arange(self.values_count, dtype=np.int64)
+        for first_bucket, last_bucket in zip(first_buckets, last_buckets):
+            if len(codes) < min_values:
+                break
+            starts = np.searchsorted(self.keys, codes * self.buckets_count + first_bucket, side='left')
+            ends = np.searchsorted(self.keys, codes * self.buckets_count + last_bucket, side='right')
+            codes = codes[ends > starts]
+        return codes
+
+    def memory_usage(self) -> int:
+        return self.keys.nbytes
+
+
+class RootCauseMining(RootCauseSearch):
+    def __init__(self, settings: SearchSettings, log_messages: LogMessages = None):
+        # Searches the root cause of every recurring error template in the dataset without a human picking the errors.
+        # The dataset is kept loaded, because all errors are searched in it. The settings of the caller are not changed.
+        settings = copy.copy(settings)
+        settings.keep_dataset_loaded = True
+        super().__init__(settings, log_messages)
+
+    def mine(self, results_file: str, error_templates: list = None, error_filter: list[str] = None,
+             bucket_seconds: float = None) -> int:
+        # Error templates are selected by their template id or by a content filter, otherwise all recurring service
+        # templates are searched. The last occurrence of each of them is searched. Each result is appended to the
+        # results file as soon as it is found, so that an interrupted run continues with the error templates, which are
+        # not in the results file yet. Returns the number of searches.
+        from tqdm.auto import tqdm
+
+        self.reset_data(True)
+        errors = self.error_templates(error_templates, error_filter)
+        completed = self.completed_errors(results_file)
+        errors = errors[~errors.index.isin(completed)]
+        self.settings.output.print_status(
+            f'{len(errors)} recurring error templates to search, {len(completed)} already searched'
+        )
+
+        if bucket_seconds is None:
+            bucket_seconds = min(strategy.window_seconds for strategy in self.settings.strategies)
+        index = PresenceIndex(self.log_messages, 'service_template_id', bucket_seconds)
+        self.settings.output.print_status(
+            f'Presence index of {len(index.keys)} service templates in time buckets uses {index.memory_usage() / 1024 ** 2:.1f} MB of memory'
+        )
+
+        # Only the progress is shown while searching, instead of the output of every search.
+        output = self.settings.output
+        self.settings.output = DisplayNoOutput()
+        skipped_count = 0
+        try:
+            with open(results_file, 'a') as file:
+                for service_template_id, error in tqdm(
+                        errors.iterrows(), total=len(errors), disable=not output.progress_bars()
+                ):
+                    self.clear_root_cause()
+                    if self.may_have_root_cause(index, error['line_id']):
+                        root_cause = self.search_error(error['line_id'])
+                    else:
+                        self.add_to_root_cause(error['line_id'], 0)
+                        root_cause = self.root_cause
+                        skipped_count += 1
+
+                    file.write(json.dumps({
+                        'service_template_id': int(service_template_id),
+                        'occurrences': int(error['occurrences']),
+                        'line_id': int(error['line_id']),
+                        'root_cause': [entry.to_dict() for entry in root_cause]
+                    }) + '\n')
+                    file.flush()
+        finally:
+            self.settings.output = output
+
+        self.clear_root_cause()
+        self.settings.output.print_completion(
+            f'{len(errors)} error templates searched, {skipped_count} of them skipped with the presence index'
+        )
+        return len(errors)
+
+    def error_templates(self, error_templates: list = None, error_filter: list[str] = None) -> pd.DataFrame:
+        # Last line and number of occurrences of each selected service template id. Errors, which occur only once, have
+        # no earlier occurrences for an intersection of time windows. Without a selection, all recurring service
+        # templates are searched.
+        dataframe = self.log_messages.log_messages
+        selected = np.full(len(dataframe), error_templates is None and error_filter is None)
+        if error_templates is not None:
+            selected |= dataframe[self.log_messages.template_column].isin(error_templates).to_numpy(dtype=bool)
+        if error_filter is not None:
+            selected |= self.log_messages.matching_rows('content', FilterPattern(error_filter).matches_series)
+
+        service_template_ids = dataframe['service_template_id'][selected].rename_axis('line_id').reset_index()
+        errors = service_template_ids.groupby('service_template_id')['line_id'].agg(['max', 'count'])
+        errors.columns = ['line_id', 'occurrences']
+        return errors[errors['occurrences'] > 1].sort_index()
+
+    @staticmethod
+    def completed_errors(results_file: str) -> set[int]:
+        # Service template ids in the results file. The last line is removed, if it was not written completely.
+        completed = set()
+        if not os.path.isfile(results_file):
+            return completed
+
+        with open(results_file, 'rb+') as file:
+            complete_size = 0
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                completed.add(json.loads(line)['service_template_id'])
+                complete_size += len(line)
+            file.truncate(complete_size)
+
+        return completed
+
+    def may_have_root_cause(self, index: PresenceIndex, error_line_id: int) -> bool:
+        # Strategies need at least two values in the intersection of the time windows. If less service template ids
+        # occur around all time windows, no strategy with them as intersection column can find a root cause. Strategies
+        # with another intersection column are always searched.
+        error = self.log_messages.get_by_id(error_line_id)
+        for strategy in self.settings.strategies:
+            if strategy.intersection_col != index.column:
+                return True
+
+            occurrences = self.occurrence_timestamps(strategy.intersection_occurrences_col, error)
+            if len(occurrences) < 2:
+                continue
+            if len(index.present_in_all_windows(occurrences, strategy.window_seconds, 2)) >= 2:
+                return True
+
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Searches the root causes of all recurring errors in a dataset.')
+    parser.add_argument('--dataset-name', required=True)
+    parser.add_argument('--source-csv-file', required=True)
+    parser.add_argument('--storage-dir', required=True)
+    parser.add_argument('--drain-config-file', required=True)
+    parser.add_argument('--storage-format', default='csv')
+    parser.add_argument('--results-file', required=True)
+    parser.add_argument(
+        '--strategy', type=parse_strategy, action='append', default=[],
+        help='intersection_occurrences_col|intersection_col|hidden_occurrences_col|uniqueness_col|max_noise|window_seconds'
+    )
+    parser.add_argument('--service-filter', action='append', default=[])
+    parser.add_argument('--content-filter', action='append', default=[])
+    parser.add_argument('--error-template', type=int, action='append', default=None, help='Template id of errors, all recurring templates by default')
+    parser.add_argument('--error-filter', action='append', default=None, help='Regular expression for error contents')
+    parser.add_argument('--bucket-seconds', type=float, default=None)
+    parser.add_argument('--parallel-processing', action='store_true')
+    args = parser.parse_args()
+
+    settings = SearchSettings(
+        dataset_name=args.dataset_name,
+        source_csv_file=args.source_csv_file,
+        storage_dir=args.storage_dir,
+        drain_config_file=args.drain_config_file,
+        strategies=args.strategy or [SearchStrategy()],
+        service_filter=args.service_filter,
+        content_filter=args.content_filter,
+        output=DisplayNotebookOutput(),
+        parallel_processing=args.parallel_processing,
+        storage_format=args.storage_format
+    )
+    mining = RootCauseMining(settings)
+    mining.mine(args.results_file, args.error_template, args.error_filter, args.bucket_seconds)
+
+
+if __name__ == '__main__':
+    main()
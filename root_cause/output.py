@@ -1,4 +1,6 @@
 from abc import ABC, abstractmethod
+import json
+import sys
 
 
 class DisplayOutput(ABC):
@@ -30,6 +32,16 @@ class DisplayOutput(ABC):
     def print_root_cause_entry(self, error_line_id: int, entry):
         pass
 
+    def collects_metrics(self) -> bool:
+        # Outputs, which do not override the metrics methods, do not collect or print any metrics.
+        return False
+
+    def tracks_memory(self) -> bool:
+        return False
+
+    def print_metrics(self, metrics):
+        pass
+
     @abstractmethod
     def colored_string(self, text: str, code: int):
         pass
@@ -80,7 +92,7 @@ class DisplayNotebookOutput(DisplayOutput):
             'Line': str(entry.line_id),
             'Timestamp': str(message['timestamp']),
             'Service': message['service'],
-            'Template': message['template'],
+            'Template': entry.template,
             'Content': self.right_trim(message['content'], ':')
         }
         for info_key, info_value in entry_info.items():
@@ -99,6 +111,16 @@ class DisplayNotebookOutput(DisplayOutput):
 
         print(message_output)
 
+    def collects_metrics(self) -> bool:
+        return True
+
+    def tracks_memory(self) -> bool:
+        return False
+
+    def print_metrics(self, metrics):
+        phases = ', '.join(f'{path} {phase["seconds"]:.3f} s' for path, phase in metrics.phases.items())
+        self.print_status(f'Duration of {metrics.name} phases: {phases}')
+
     def colored_string(self, text: str, code: int):
         return f'\x1b[{code}m{text}\x1b[0m'
 
@@ -133,3 +155,54 @@ class DisplayNoOutput(DisplayOutput):
 
     def colored_bold_string(self, text: str, code: int):
         pass
+
+
+class DisplayJsonLinesOutput(DisplayOutput):
+    def __init__(self, file=None, track_memory: bool = False):
+        # Writes every output as one JSON object per line to the file, or to the standard output if it is not given.
+        self.file = file
+        self.track_memory = track_memory
+
+    def write(self, event: str, **fields):
+        line = json.dumps({'event': event, **fields}) + '\n'
+        if self.file is None:
+            sys.stdout.write(line)
+        else:
+            with open(self.file, 'a') as file:
+                file.write(line)
+
+    def progress_bars(self) -> bool:
+        return False
+
+    def print_headline(self, text: str):
+        self.write('headline', text=text)
+
+    def print_next(self, text: str):
+        self.write('next', text=text)
+
+    def print_status(self, text: str):
+        self.write('status', text=text)
+
+    def print_completion(self, text: str):
+        self.write('completion', text=text)
+
+    def print_root_cause(self, error_line_id: int, root_cause: list):
+        self.write('root_cause', error_line_id=int(error_line_id), entries=[entry.to_dict() for entry in root_cause])
+
+    def print_root_cause_entry(self, error_line_id: int, entry):
+        self.write('root_cause_entry', error_line_id=int(error_line_id), entry=entry.to_dict())
+
+    def collects_metrics(self) -> bool:
+        return True
+
+    def tracks_memory(self) -> bool:
+        return self.track_memory
+
+    def print_metrics(self, metrics):
+        self.write('metrics', **metrics.to_dict())
+
+    def colored_string(self, text: str, code: int):
+        return text
+
+    def colored_bold_string(self, text: str, code: int):
+        return text
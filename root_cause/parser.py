@@ -1,23 +1,85 @@
-from drain3.file_persistence import FilePersistence as DrainFilePersistence
-from drain3 import TemplateMiner as DrainTemplateMiner
-from drain3.template_miner_config import TemplateMinerConfig as DrainTemplateMinerConfig
-
-
 class TemplateParser:
-    def __init__(self, drain_config_file: str, drain_state_file: str):
+    def __init__(
+            self,
+            drain_config_file: str,
+            drain_state_file: str = None,
+            save_changes: bool = True,
+            mask_contents: bool = True
+    ):
+        # Drain is only imported when templates are created or matched. Searches in a prepared dataset do not need it.
+        from drain3.file_persistence import FilePersistence as DrainFilePersistence
+        from drain3.masking import LogMasker as DrainLogMasker
+        from drain3 import TemplateMiner as DrainTemplateMiner
+        from drain3.template_miner_config import TemplateMinerConfig as DrainTemplateMinerConfig
+
         config = DrainTemplateMinerConfig()
         config.load(drain_config_file)
-        persistence = DrainFilePersistence(drain_state_file)
-        self.miner = DrainTemplateMiner(persistence, config)
+        self.persistence = None
+        if drain_state_file is not None:
+            self.persistence = DrainFilePersistence(drain_state_file)
+        self.miner = DrainTemplateMiner(self.persistence, config)
+
+        # Contents, which are already masked by a ContentMasker, are not masked again.
+        if not mask_contents:
+            self.miner.masker = DrainLogMasker([], config.mask_prefix, config.mask_suffix)
+
+        # Drain saves its whole state after each changed cluster. Without saving changes, it is only saved by save_state.
+        self.save_changes = save_changes
+        if not save_changes:
+            self.miner.persistence_handler = None
+
+    def add_log_message(self, content: str) -> int:
+        return self.miner.add_log_message(content)['cluster_id']
 
-    def add_log_message(self, content: str):
-        self.miner.add_log_message(content)
+    def save_state(self):
+        if self.persistence is None:
+            return
+        self.miner.persistence_handler = self.persistence
+        self.miner.save_state('saved by template parser')
+        if not self.save_changes:
+            self.miner.persistence_handler = None
+
+    def cluster_templates(self) -> list[str]:
+        return [cluster.get_template() for cluster in self.miner.drain.clusters]
+
+    def templates(self) -> dict[int, str]:
+        # Template of each cluster by its id.
+        return {cluster.cluster_id: cluster.get_template() for cluster in self.miner.drain.clusters}
+
+    def match_template_id(self, content: str) -> int:
+        # The ids of the Drain clusters start with 1. Contents without a matching cluster get the id 0.
+        cluster = self.miner.match(content)
+        if cluster is not None:
+            return cluster.cluster_id
+        return 0
 
-    def get_template(self, content: str) -> str:
+    def match_template(self, content: str) -> str:
         cluster = self.miner.match(content)
         if cluster is not None:
             return cluster.get_template()
         return ''
 
+    def get_cluster_template(self, cluster_id: int) -> str:
+        # The template of a cluster becomes more general while log messages are added to it.
+        cluster = self.miner.drain.id_to_cluster.get(cluster_id)
+        if cluster is not None:
+            return cluster.get_template()
+        return ''
+
     def extract_template_parameters(self, content: str, template: str) -> list:
         return self.miner.get_parameter_list(content, template)
+
+
+class ContentMasker:
+    def __init__(self, drain_config_file: str):
+        # Masks contents with the masking instructions of the Drain config in the same way as Drain does it before a
+        # content is clustered or matched.
+        from drain3.masking import LogMasker as DrainLogMasker
+        from drain3.template_miner_config import TemplateMinerConfig as DrainTemplateMinerConfig
+
+        config = DrainTemplateMinerConfig()
+        config.load(drain_config_file)
+        self.masker = DrainLogMasker(config.masking_instructions, config.mask_prefix, config.mask_suffix)
+
+    def mask(self, content: str) -> str:
+        return self.masker.mask(content)
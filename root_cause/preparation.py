@@ -1,104 +1,530 @@
+from cache import ContentCache
 from messages import LogMessages
+from metrics import Metrics
 import os
 import pandas as pd
-from parser import TemplateParser
+from parser import ContentMasker, TemplateParser
 from settings import SearchSettings
+import shutil
+from storage import StorageChunks, StorageChunkWriter
+import time
 
 
 class DatasetPreparation:
     def __init__(self, settings: SearchSettings):
         self.settings = settings
+        self.metrics = Metrics.for_output(settings.output, 'preparation')
 
     def get(self, is_reload: bool) -> LogMessages:
-        log_messages = self.read_csv(is_reload)
-
-        if is_reload:
+        self.metrics = Metrics.for_output(self.settings.output, 'preparation', is_reload=is_reload)
+        if not is_reload and self.settings.chunk_size is not None:
+            with self.metrics.phase('prepare_in_chunks'):
+                self.prepare_in_chunks()
+            with self.metrics.phase('read_file'):
+                log_messages = self.read_file(True)
+            action = 'Dataset loaded and prepared'
+        elif is_reload:
+            with self.metrics.phase('read_file'):
+                log_messages = self.read_file(is_reload)
             action = 'Dataset loaded'
         else:
-            log_messages = self.prepare_for_template_clustering(log_messages)
-            self.create_template_clusters(log_messages)
-            log_messages = self.assign_templates(log_messages)
-            self.delete_pre_clustering_data()
+            with self.metrics.phase('read_file'):
+                log_messages = self.read_file(is_reload)
+            with self.metrics.phase('prepare_for_template_clustering'):
+                log_messages = self.prepare_for_template_clustering(log_messages)
+            with self.metrics.phase('mask_contents'):
+                masking = self.mask_contents(log_messages)
+            with self.metrics.phase('create_template_clusters'):
+                self.create_template_clusters(log_messages, masking)
+            with self.metrics.phase('assign_templates'):
+                log_messages = self.assign_templates(log_messages, masking)
+            with self.metrics.phase('delete_pre_clustering_data'):
+                self.delete_pre_clustering_data()
             action = 'Dataset loaded and prepared'
 
+        with self.metrics.phase('encode_columns'):
+            log_messages.encode_columns()
+        self.settings.output.print_status(f'Dataset uses {log_messages.memory_usage() / 1024 ** 2:.1f} MB of memory')
+        self.settings.output.print_metrics(self.metrics)
+
         self.settings.output.print_completion(action)
         return log_messages
 
-    def read_csv(self, is_reload: bool) -> LogMessages:
-        if not self.settings.pre_clustering_csv_file_exists() and not self.settings.post_clustering_csv_file_exists():
-            csv_file = self.settings.source_csv_file
-        elif not self.settings.post_clustering_csv_file_exists():
-            csv_file = self.settings.pre_clustering_csv_file
+    def read_file(self, is_reload: bool) -> LogMessages:
+        if not self.settings.pre_clustering_file_exists() and not self.settings.post_clustering_file_exists():
+            file = self.settings.source_csv_file
+        elif not self.settings.post_clustering_file_exists():
+            file = self.settings.pre_clustering_file()
         else:
-            csv_file = self.settings.post_clustering_csv_file
+            file = self.settings.post_clustering_file()
 
         if is_reload:
-            action = f'Reloading dataset from CSV file'
+            action = f'Reloading dataset from file'
         else:
-            action = f'Loading dataset from CSV file and preparing it'
+            action = f'Loading dataset from file and preparing it'
         self.settings.output.print_headline(action)
 
-        log_messages = LogMessages(pd.read_csv(csv_file, index_col='line_id'))
+        log_messages = LogMessages(self.read_dataframe(file))
 
-        if self.settings.post_clustering_csv_file_exists():
+        if self.settings.post_clustering_file_exists():
             log_messages.ensure_required_columns_exist(True)
-        elif self.settings.pre_clustering_csv_file_exists():
+            if log_messages.template_column == 'template_id':
+                log_messages.templates = self.read_templates()
+        elif self.settings.pre_clustering_file_exists():
             log_messages.ensure_required_columns_exist(False)
 
         return log_messages
 
+    def read_templates(self) -> pd.Series:
+        if not self.settings.templates_file_exists():
+            raise ValueError('Templates file of the prepared dataset does not exist.')
+        templates = pd.read_csv(self.settings.templates_file, index_col='template_id', keep_default_na=False)
+        return templates['template']
+
+    def write_templates(self, templates: dict[int, str], file: str = None) -> pd.Series:
+        # Log messages only hold the id of their template. The templates are stored once in a side table.
+        templates = pd.Series(templates, name='template', dtype=object).rename_axis('template_id')
+        templates.to_csv(file or self.settings.templates_file)
+        return templates
+
+    def write_drain_templates(self, drain_state_file: str) -> pd.Series:
+        return self.write_templates(TemplateParser(self.settings.drain_config_file, drain_state_file).templates())
+
+    def read_dataframe(self, file: str) -> pd.DataFrame:
+        if file.endswith('.parquet'):
+            return pd.read_parquet(file, memory_map=self.settings.memory_map)
+        if file.endswith('.feather'):
+            # Pandas does not support memory mapping for Feather files, so the table is read with pyarrow.
+            from pyarrow import feather
+            table = feather.read_table(file, memory_map=self.settings.memory_map)
+            return table.to_pandas().set_index('line_id')
+        return pd.read_csv(file, index_col='line_id')
+
     def prepare_for_template_clustering(self, log_messages: LogMessages) -> LogMessages:
         self.settings.output.print_next('Preparing dataset for template clustering')
 
-        if not self.settings.pre_clustering_csv_file_exists() and not self.settings.post_clustering_csv_file_exists():
-            log_messages.normalize_column_names()
-            log_messages.combine_daytime_to_timestamps()
-            log_messages.ensure_required_columns_exist(False)
-            log_messages.remove_unnecessary_columns()
-            log_messages.validate_timestamp_format()
-            log_messages.validate_timestamp_order()
-            log_messages.to_csv(self.settings.pre_clustering_csv_file)
+        if not self.settings.pre_clustering_file_exists() and not self.settings.post_clustering_file_exists():
+            self.prepare_log_messages(log_messages)
+            log_messages.to_file(self.settings.pre_clustering_file())
 
         return log_messages
 
-    def create_template_clusters(self, log_messages: LogMessages):
+    @staticmethod
+    def prepare_log_messages(log_messages: LogMessages, previous_timestamp=None):
+        log_messages.normalize_column_names()
+        log_messages.combine_daytime_to_timestamps()
+        log_messages.ensure_required_columns_exist(False)
+        log_messages.remove_unnecessary_columns()
+        log_messages.validate_timestamp_format()
+        log_messages.validate_timestamp_order(previous_timestamp)
+
+    def mask_contents(self, log_messages: LogMessages) -> 'ContentMasking':
+        # Each distinct content is masked once before it is clustered and matched. Drain then gets the masked contents
+        # and does not mask them again.
+        self.settings.output.print_next('Masking log message contents')
+
+        if self.settings.post_clustering_file_exists():
+            return None
+
+        start_time = time.perf_counter()
+        masking = ContentMasking(
+            self.settings.drain_config_file, self.settings.parallel_processing, self.settings.output.progress_bars()
+        )
+        masked_count = masking.mask_contents(log_messages.log_messages['content'].unique())
+        seconds = time.perf_counter() - start_time
+
+        # The throughput counts all log messages, whose contents are masked by masking their distinct contents.
+        messages_count = len(log_messages.log_messages)
+        self.settings.output.print_status(
+            f'{masked_count} distinct contents of {messages_count} log messages masked in {seconds:.1f} seconds ({messages_count / max(seconds, 1e-9):,.0f} lines per second)'
+        )
+        return masking
+
+    def mask(self, contents: list[str]) -> list[str]:
+        # Masked forms of the contents. With parallel processing, they are masked in worker processes.
+        masking = ContentMasking(self.settings.drain_config_file, self.settings.parallel_processing, False)
+        masking.mask_contents(contents)
+        return masking.get(contents)
+
+    def create_template_clusters(self, log_messages: LogMessages, masking: 'ContentMasking' = None):
         self.settings.output.print_next('Creating template clusters')
 
-        if not self.settings.drain_state_file_file_exists() and not self.settings.post_clustering_csv_file_exists():
+        if not self.settings.drain_state_file_file_exists() and not self.settings.post_clustering_file_exists():
             if os.path.isfile(self.settings.temporary_drain_state_file):
                 os.remove(self.settings.temporary_drain_state_file)
 
-            parser = TemplateParser(self.settings.drain_config_file, self.settings.temporary_drain_state_file)
+            parser = TemplateParser(
+                self.settings.drain_config_file, self.settings.temporary_drain_state_file, save_changes=False,
+                mask_contents=masking is None
+            )
+            if self.settings.clustering_shards > 1:
+                self.add_to_sharded_template_clusters(log_messages, parser, masking)
+            else:
+                self.add_to_template_clusters(
+                    log_messages, parser, self.settings.output.progress_bars(), None if masking is None else masking.masked
+                )
+            parser.save_state()
+
+            os.rename(self.settings.temporary_drain_state_file, self.settings.drain_state_file)
+
+    @staticmethod
+    def add_to_template_clusters(log_messages: LogMessages, parser: TemplateParser, show_progress: bool,
+                                 masked: dict[str, str] = None):
+        # Without the masked form of each content, the parser masks the contents itself.
+        if masked is None:
+            log_messages.apply_on_column('content', lambda content: parser.add_log_message(content), show_progress)
+        else:
             log_messages.apply_on_column(
-                'content',
-                lambda content: parser.add_log_message(content),
-                self.settings.output.progress_bars()
+                'content', lambda content: parser.add_log_message(masked[content]), show_progress
             )
 
+    def add_to_sharded_template_clusters(self, log_messages: LogMessages, parser: TemplateParser,
+                                         masking: 'ContentMasking' = None):
+        # Each shard is clustered by its own Drain in a worker process. The templates of all shards are then added to
+        # the combined clusters, where similar templates of different shards are merged.
+        clustering = ShardedTemplateClustering(
+            self.settings.drain_config_file, self.settings.clustering_shards, self.settings.shard_by
+        )
+        templates = clustering.cluster(log_messages, masking)
+        for template in templates:
+            parser.add_log_message(template)
+        self.settings.output.print_status(
+            f'{len(templates)} templates of {self.settings.clustering_shards} shards merged into {len(parser.cluster_templates())} templates'
+        )
+
+    def assign_templates(self, log_messages: LogMessages, masking: 'ContentMasking' = None) -> LogMessages:
+        self.settings.output.print_next('Assigning the templates to their log messages')
+
+        if not self.settings.post_clustering_file_exists():
+            start_time = time.perf_counter()
+            with self.template_matching(self.settings.output.progress_bars(), masking is None) as matching, \
+                    self.metrics.phase('match_templates'):
+                match_template_ids = matching.match_template_ids
+                if masking is not None:
+                    match_template_ids = lambda contents: matching.match_template_ids(masking.get(contents))
+                unique_count = log_messages.map_unique_values('content', 'template_id', match_template_ids)
+            self.print_deduplication_status(len(log_messages.log_messages), unique_count, start_time)
+            with self.metrics.phase('add_service_template_ids'):
+                log_messages.add_service_template_ids()
+            with self.metrics.phase('write_file'):
+                log_messages.templates = self.write_drain_templates(self.settings.drain_state_file)
+                log_messages.to_file(self.settings.post_clustering_file())
+
+        return log_messages
+
+    def template_matching(self, show_progress: bool, mask_contents: bool = True):
+        if self.settings.parallel_processing:
+            return ParallelTemplateMatching(
+                self.settings.drain_config_file, self.settings.drain_state_file, show_progress, mask_contents
+            )
+        return TemplateMatching(
+            self.settings.drain_config_file, self.settings.drain_state_file, show_progress, mask_contents
+        )
+
+    def prepare_in_chunks(self):
+        # Only one chunk of log messages is held in memory at a time. The source file is read once to prepare the log
+        # messages and to create the template clusters. The prepared file is then read once to assign the templates.
+        # Contents, which repeat in later chunks, are found in bounded caches of their masked forms and template ids
+        # instead of masking and matching them again.
+        from tqdm.auto import tqdm
+
+        self.settings.output.print_headline(f'Preparing dataset in chunks of {self.settings.chunk_size} log messages')
+        show_progress = self.settings.output.progress_bars()
+        masked_contents = ContentCache(self.settings.content_cache_max_entries)
+        template_ids = ContentCache(self.settings.content_cache_max_entries)
+
+        parser = None
+        if not self.settings.drain_state_file_file_exists() and not self.settings.post_clustering_file_exists():
+            if os.path.isfile(self.settings.temporary_drain_state_file):
+                os.remove(self.settings.temporary_drain_state_file)
+            parser = TemplateParser(
+                self.settings.drain_config_file, self.settings.temporary_drain_state_file, save_changes=False,
+                mask_contents=False
+            )
+
+        if not self.settings.pre_clustering_file_exists() and not self.settings.post_clustering_file_exists():
+            self.settings.output.print_next('Preparing dataset for template clustering and creating template clusters')
+            writer = StorageChunkWriter(self.settings.pre_clustering_file())
+            previous_timestamp = None
+            chunks = pd.read_csv(self.settings.source_csv_file, index_col='line_id', chunksize=self.settings.chunk_size)
+            for chunk in tqdm(chunks, unit='chunks', disable=not show_progress):
+                log_messages = LogMessages(chunk)
+                self.prepare_log_messages(log_messages, previous_timestamp)
+                previous_timestamp = log_messages.log_messages.iloc[-1]['timestamp']
+                writer.write(log_messages.log_messages)
+                if parser is not None:
+                    masked = masked_contents.get_many(log_messages.log_messages['content'].unique(), self.mask)
+                    self.add_to_template_clusters(log_messages, parser, False, masked)
+            writer.close()
+        elif parser is not None:
+            self.settings.output.print_next('Creating template clusters')
+            chunks = StorageChunks(self.settings.pre_clustering_file(), self.settings.chunk_size)
+            for chunk in tqdm(chunks, unit='chunks', disable=not show_progress):
+                log_messages = LogMessages(chunk)
+                masked = masked_contents.get_many(log_messages.log_messages['content'].unique(), self.mask)
+                self.add_to_template_clusters(log_messages, parser, False, masked)
+
+        if parser is not None:
+            parser.save_state()
             os.rename(self.settings.temporary_drain_state_file, self.settings.drain_state_file)
 
-    def assign_templates(self, log_messages: LogMessages) -> LogMessages:
         self.settings.output.print_next('Assigning the templates to their log messages')
+        if not self.settings.post_clustering_file_exists():
+            # Service template ids are kept from chunk to chunk, so that log messages are grouped the same way as without
+            # chunks. New pairs are numbered per chunk, so the ids themselves can differ from the ones without chunks.
+            writer = StorageChunkWriter(self.settings.post_clustering_file())
+            known_ids = {}
+            messages_count = 0
+            start_time = time.perf_counter()
+            chunks = StorageChunks(self.settings.pre_clustering_file(), self.settings.chunk_size)
+            self.write_drain_templates(self.settings.drain_state_file)
+            with self.template_matching(False, False) as matching:
+                def match_template_ids(contents: list[str]) -> list[int]:
+                    masked = masked_contents.get_many(contents, self.mask)
+                    return matching.match_template_ids([masked[content] for content in contents])
+
+                def cached_template_ids(contents: list[str]) -> list[int]:
+                    cached = template_ids.get_many(contents, match_template_ids)
+                    return [cached[content] for content in contents]
 
-        if not self.settings.post_clustering_csv_file_exists():
-            parser = TemplateParser(self.settings.drain_config_file, self.settings.drain_state_file)
-            log_messages.create_empty_column('template', None)
-            log_messages.parallel_apply_on_rows(
-                self.assign_template,
-                self.settings.parallel_processing,
-                self.settings.output.progress_bars(),
-                parser
+                for chunk in tqdm(chunks, unit='chunks', disable=not show_progress):
+                    log_messages = LogMessages(chunk)
+                    log_messages.ensure_required_columns_exist(False)
+                    log_messages.map_unique_values('content', 'template_id', cached_template_ids)
+                    messages_count += len(log_messages.log_messages)
+                    known_ids = log_messages.add_service_template_ids(known_ids)
+                    writer.write(log_messages.log_messages)
+            writer.close()
+            self.print_deduplication_status(messages_count, template_ids.misses, start_time)
+            self.settings.output.print_status(
+                f'{template_ids.hit_rate():.1%} of the distinct contents of the chunks found in the template id cache, {masked_contents.hit_rate():.1%} in the masked content cache'
             )
-            log_messages.add_service_template_ids()
-            log_messages.to_csv(self.settings.post_clustering_csv_file)
 
+        self.delete_pre_clustering_data()
+
+    def append(self, csv_file: str, log_messages: LogMessages) -> LogMessages:
+        # Only the new log messages are clustered and get templates assigned. The Drain state is continued in a copy,
+        # which replaces the persisted state after the new log messages have been stored.
+        self.settings.output.print_headline('Appending log messages to dataset')
+        if not self.settings.post_clustering_file_exists() or not self.settings.drain_state_file_file_exists():
+            raise ValueError('Dataset has to be prepared before log messages can be appended.')
+
+        new_log_messages = LogMessages(pd.read_csv(csv_file, index_col='line_id'))
+        self.settings.output.print_next('Preparing appended log messages for template clustering')
+        self.prepare_log_messages(new_log_messages, log_messages.log_messages.iloc[-1]['timestamp'])
+        if new_log_messages.log_messages.index.min() <= log_messages.log_messages.index.max():
+            raise ValueError('Line ids of the appended log messages must be greater than the existing ones.')
+
+        self.settings.output.print_next('Adding appended log messages to template clusters')
+        masking = ContentMasking(self.settings.drain_config_file, False, False)
+        masking.mask_contents(new_log_messages.log_messages['content'].unique())
+        shutil.copyfile(self.settings.drain_state_file, self.settings.temporary_drain_state_file)
+        parser = TemplateParser(
+            self.settings.drain_config_file, self.settings.temporary_drain_state_file, save_changes=False,
+            mask_contents=False
+        )
+        self.add_to_template_clusters(new_log_messages, parser, self.settings.output.progress_bars(), masking.masked)
+        parser.save_state()
+
+        self.settings.output.print_next('Assigning the templates to the appended log messages')
+        matching = TemplateMatching(
+            self.settings.drain_config_file, self.settings.temporary_drain_state_file, False, mask_contents=False
+        )
+        new_log_messages.map_unique_values(
+            'content', 'template_id', lambda contents: matching.match_template_ids(masking.get(contents))
+        )
+
+        # Existing log messages get the current templates of their clusters. Datasets prepared before the templates
+        # were stored as ids get the templates of the appended log messages instead of their ids.
+        templates_file = self.settings.templates_file + '.tmp'
+        templates = self.write_templates(parser.templates(), templates_file)
+        if log_messages.template_column == 'template':
+            new_log_messages.log_messages['template'] = new_log_messages.log_messages.pop('template_id').map(templates)
+        else:
+            log_messages.templates = templates
+        new_log_messages.add_service_template_ids(log_messages.service_template_ids())
+
+        # The templates and the Drain state are replaced before the new log messages are stored. If storing them is
+        # interrupted, the stored log messages still have templates of their template ids. CSV files are extended.
+        # Columnar files can not be extended, so they are written again.
+        os.replace(templates_file, self.settings.templates_file)
+        os.replace(self.settings.temporary_drain_state_file, self.settings.drain_state_file)
+        log_messages.append(new_log_messages)
+        post_clustering_file = self.settings.post_clustering_file()
+        if post_clustering_file.endswith('.csv'):
+            new_log_messages.to_csv(post_clustering_file, True)
+        else:
+            root, extension = os.path.splitext(post_clustering_file)
+            temporary_file = root + '.tmp' + extension
+            log_messages.to_file(temporary_file)
+            os.replace(temporary_file, post_clustering_file)
+
+        self.settings.output.print_completion(f'{len(new_log_messages.log_messages)} log messages appended')
         return log_messages
 
-    @staticmethod
-    def assign_template(row, parser):
-        row['template'] = parser.get_template(row['content'])
-        return row
+    def print_deduplication_status(self, messages_count: int, unique_count: int, start_time: float):
+        # Only the distinct contents are matched and their templates are mapped to all log messages. The saved time is
+        # estimated with the average duration of matching one content.
+        saved_count = messages_count - unique_count
+        seconds_saved = (time.perf_counter() - start_time) / max(unique_count, 1) * saved_count
+        self.settings.output.print_status(
+            f'{unique_count} distinct contents of {messages_count} log messages matched, {saved_count / max(messages_count, 1):.1%} of the matches saved by deduplication, about {seconds_saved:.1f} seconds saved'
+        )
 
     def delete_pre_clustering_data(self):
-        if os.path.isfile(self.settings.pre_clustering_csv_file):
-            os.remove(self.settings.pre_clustering_csv_file)
+        if self.settings.pre_clustering_file_exists():
+            os.remove(self.settings.pre_clustering_file())
+
+
+class ContentMasking:
+    # Masker of a worker process.
+    masker = None
+
+    def __init__(self, drain_config_file: str, parallel_processing: bool, show_progress: bool):
+        # Masked form of each distinct content. It is shared by the clustering and the matching of the templates.
+        self.drain_config_file = drain_config_file
+        self.parallel_processing = parallel_processing
+        self.show_progress = show_progress
+        self.workers_count = max(os.cpu_count() - 1, 1)
+        self.masked = {}
+
+    def mask_contents(self, contents: list[str]) -> int:
+        # Masks the contents, which are not masked yet, and returns their number.
+        from tqdm.auto import tqdm
+
+        contents = [content for content in dict.fromkeys(contents) if content not in self.masked]
+        if self.parallel_processing and len(contents) > 0:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(
+                    max_workers=self.workers_count,
+                    initializer=ContentMasking.init_worker,
+                    initargs=(self.drain_config_file,)
+            ) as executor:
+                chunk_size = max(len(contents) // (self.workers_count * 16), 1)
+                masked = list(tqdm(
+                    executor.map(ContentMasking.mask_content, contents, chunksize=chunk_size),
+                    total=len(contents), disable=not self.show_progress
+                ))
+        else:
+            masker = ContentMasker(self.drain_config_file)
+            masked = [masker.mask(content) for content in tqdm(contents, disable=not self.show_progress)]
+
+        self.masked.update(zip(contents, masked))
+        return len(contents)
+
+    def get(self, contents: list[str]) -> list[str]:
+        return [self.masked[content] for content in contents]
+
+    @staticmethod
+    def init_worker(drain_config_file: str):
+        ContentMasking.masker = ContentMasker(drain_config_file)
+
+    @staticmethod
+    def mask_content(content: str) -> str:
+        return ContentMasking.masker.mask(content)
+
+
+class TemplateMatching:
+    def __init__(self, drain_config_file: str, drain_state_file: str, show_progress: bool, mask_contents: bool = True):
+        self.parser = TemplateParser(drain_config_file, drain_state_file, mask_contents=mask_contents)
+        self.show_progress = show_progress
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def match_template_ids(self, contents: list[str]) -> list[int]:
+        from tqdm.auto import tqdm
+        return [self.parser.match_template_id(content) for content in tqdm(contents, disable=not self.show_progress)]
+
+
+class ParallelTemplateMatching:
+    # Template parser of a worker process. It is created once per worker from the persisted Drain state.
+    parser = None
+
+    def __init__(self, drain_config_file: str, drain_state_file: str, show_progress: bool, mask_contents: bool = True):
+        self.drain_config_file = drain_config_file
+        self.drain_state_file = drain_state_file
+        self.show_progress = show_progress
+        self.mask_contents = mask_contents
+        self.workers_count = max(os.cpu_count() - 1, 1)
+        self.executor = None
+
+    def __enter__(self):
+        # The worker processes are kept for all calls, so that each of them loads the Drain state only once.
+        from concurrent.futures import ProcessPoolExecutor
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers_count,
+            initializer=ParallelTemplateMatching.init_worker,
+            initargs=(self.drain_config_file, self.drain_state_file, self.mask_contents)
+        )
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.executor.shutdown()
+
+    def match_template_ids(self, contents: list[str]) -> list[int]:
+        # Workers only receive the contents and return the ids of the matched templates in the same order.
+        from tqdm.auto import tqdm
+        chunk_size = max(len(contents) // (self.workers_count * 16), 1)
+        template_ids = self.executor.map(ParallelTemplateMatching.match_template_id, contents, chunksize=chunk_size)
+        return list(tqdm(template_ids, total=len(contents), disable=not self.show_progress))
+
+    @staticmethod
+    def init_worker(drain_config_file: str, drain_state_file: str, mask_contents: bool):
+        ParallelTemplateMatching.parser = TemplateParser(drain_config_file, drain_state_file, mask_contents=mask_contents)
+
+    @staticmethod
+    def match_template_id(content: str) -> int:
+        return ParallelTemplateMatching.parser.match_template_id(content)
+
+
+class ShardedTemplateClustering:
+    def __init__(self, drain_config_file: str, shards_count: int, shard_by: str):
+        self.drain_config_file = drain_config_file
+        self.shards_count = shards_count
+        self.shard_by = shard_by
+
+    def cluster(self, log_messages: LogMessages, masking: ContentMasking = None) -> list[str]:
+        from concurrent.futures import ProcessPoolExecutor
+
+        shards = self.create_shards(log_messages)
+        if masking is not None:
+            shards = [list(dict.fromkeys(masking.get(shard))) for shard in shards]
+        workers_count = max(min(self.shards_count, os.cpu_count() - 1), 1)
+        with ProcessPoolExecutor(max_workers=workers_count) as executor:
+            shard_templates = executor.map(
+                ShardedTemplateClustering.cluster_shard, [self.drain_config_file] * len(shards), shards,
+                [masking is None] * len(shards)
+            )
+            return [template for templates in shard_templates for template in templates]
+
+    def create_shards(self, log_messages: LogMessages) -> list[list[str]]:
+        # A repeated content does not change the template of its cluster, so each shard only gets distinct contents
+        # in the order of their first occurrence.
+        dataframe = log_messages.log_messages
+        if self.shard_by == 'service':
+            # Services are distributed over the shards by their number of log messages, largest service first.
+            service_sizes = dataframe['service'].value_counts(sort=True)
+            shard_sizes = [0] * self.shards_count
+            service_shards = {}
+            for service, size in service_sizes.items():
+                shard = shard_sizes.index(min(shard_sizes))
+                service_shards[service] = shard
+                shard_sizes[shard] += size
+            shard_numbers = dataframe['service'].map(service_shards).fillna(0).to_numpy(dtype=int)
+        else:
+            shard_numbers = pd.util.hash_pandas_object(dataframe['content'], index=False).to_numpy() % self.shards_count
+
+        contents = dataframe['content']
+        shards = [contents[shard_numbers == shard].drop_duplicates().to_list() for shard in range(self.shards_count)]
+        return [shard for shard in shards if len(shard) > 0]
+
+    @staticmethod
+    def cluster_shard(drain_config_file: str, contents: list[str], mask_contents: bool) -> list[str]:
+        parser = TemplateParser(drain_config_file, save_changes=False, mask_contents=mask_contents)
+        for content in contents:
+            parser.add_log_message(content)
+        return parser.cluster_templates()
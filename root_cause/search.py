@@ -1,139 +1,327 @@
+from cache import SearchCache
 import copy
+from messages import LogMessages
+from metrics import Metrics
 import pandas as pd
 from preparation import DatasetPreparation
-import re
 from settings import SearchStrategy
 from settings import SearchSettings
+from shared import SharedStrategySearch
 
 
 class RootCauseEntry:
-    def __init__(self, line_id: int, message: pd.Series, strategies: list[SearchStrategy]):
+    def __init__(self, line_id: int, message: pd.Series, strategies: list[SearchStrategy], templates: pd.Series = None):
         self.line_id = line_id
         self.message = message
         self.strategies = strategies
+        self.templates = templates
+
+    @property
+    def template(self) -> str:
+        # The template is looked up by its id only when it is shown. Datasets prepared before the templates were stored
+        # as ids contain the template itself.
+        if 'template_id' not in self.message.index:
+            return self.message['template']
+        return self.templates.get(self.message['template_id'], '')
+
+    def to_dict(self) -> dict:
+        return {
+            'line_id': int(self.line_id),
+            'timestamp': str(self.message['timestamp']),
+            'service': str(self.message['service']),
+            'template': str(self.template),
+            'content': str(self.message['content']),
+            'strategies': [strategy.to_dict() for strategy in self.strategies]
+        }
+
+
+class RootCauseResult(list):
+    # Root cause entries of a search with the metrics of its phases.
+    def __init__(self, entries: list[RootCauseEntry], metrics: Metrics):
+        super().__init__(entries)
+        self.metrics = metrics
 
 
 class RootCauseSearch:
-    def __init__(self, settings: SearchSettings):
+    def __init__(self, settings: SearchSettings, log_messages: LogMessages = None):
+        # Log messages can be given instead of loading the prepared dataset, e.g. the recent messages of a live log.
         self.settings = settings
-        self.log_messages = None
-        self.root_cause = []
+        self.log_messages = log_messages
+        self.preparation_metrics = None
+        self.metrics = Metrics.for_output(settings.output, 'search')
+        self.clear_root_cause()
+        self.cache = SearchCache(settings.cache_max_entries, settings.cache_max_bytes)
+        self.shared_search = SharedStrategySearch(settings)
         self.reset_data(False)
 
     def reset_data(self, is_reload: bool):
-        # Reload dataset after each search. This is necessary because it is changed by the search. However, the steps
-        # for preparing the dataset are only executed during the first loading in the constructor of this class. After
-        # that they are skipped to increase the speed.
+        # Reload dataset after each search unless it is kept loaded. The search only reads the dataset, so a loaded
+        # dataset can be shared by all searches of this object. The steps for preparing the dataset are only executed
+        # during the first loading in the constructor of this class. After that they are skipped to increase the speed.
         if self.log_messages is None:
-            self.log_messages = DatasetPreparation(self.settings).get(is_reload)
+            preparation = DatasetPreparation(self.settings)
+            self.log_messages = preparation.get(is_reload)
+            self.preparation_metrics = preparation.metrics
+
+        # Remove results of last search.
+        self.clear_root_cause()
 
-            # Remove results of last search.
-            self.root_cause = []
+    def use_log_messages(self, log_messages: LogMessages):
+        # Following searches use these log messages until they are released.
+        self.log_messages = log_messages
+        self.clear_root_cause()
 
     def search(self, error_line_id: int):
         self.reset_data(True)
+        self.search_error(error_line_id, self.submit_shared_searches([error_line_id]).get(error_line_id))
+        self.release_data()
 
-        error = self.log_messages.get_by_id(error_line_id)
+        return self.root_cause
+
+    def search_many(self, error_line_ids: list[int]) -> dict[int, list[RootCauseEntry]]:
+        self.reset_data(True)
+
+        # Errors with the same values in the occurrence columns of all strategies share the intersection of the time
+        # windows and the counts outside of them. They are searched one group after another, so that the shared
+        # results are still cached when the next error of the group is searched.
+        groups = {}
+        for error_line_id in error_line_ids:
+            error = self.log_messages.get_by_id(error_line_id)
+            groups.setdefault(self.occurrence_values(error), []).append(error_line_id)
+
+        shared_results = self.submit_shared_searches(error_line_ids)
+        root_causes = {}
+        for group in groups.values():
+            for error_line_id in group:
+                self.clear_root_cause()
+                root_causes[error_line_id] = self.search_error(error_line_id, shared_results.get(error_line_id))
+        self.release_data()
+
+        return {error_line_id: root_causes[error_line_id] for error_line_id in error_line_ids}
+
+    def append(self, csv_file: str):
+        # Add new log messages to the prepared dataset. Cached results of the previous data can not be used anymore.
+        self.reset_data(True)
+        self.log_messages = DatasetPreparation(self.settings).append(csv_file, self.log_messages)
+        self.cache.clear()
+
+        if not self.settings.keep_dataset_loaded:
+            self.log_messages = None
+
+    def submit_shared_searches(self, error_line_ids: list[int]) -> dict[int, list]:
+        # With several search workers, the strategies of all errors are evaluated concurrently in worker processes.
+        # Their candidates are still added to the root cause by this process in the order of the strategies.
+        if self.settings.search_workers < 2:
+            return {}
+        return {
+            error_line_id: self.shared_search.submit(self.log_messages, error_line_id)
+            for error_line_id in dict.fromkeys(error_line_ids)
+        }
+
+    def occurrence_values(self, error: pd.Series) -> tuple:
+        values = []
         for strategy in self.settings.strategies:
-            self.search_strategy(error_line_id, error, strategy)
+            values.append(error[strategy.intersection_occurrences_col])
+            values.append(error[strategy.hidden_occurrences_col])
+        return tuple(values)
+
+    def release_data(self):
+        statistics = self.cache.statistics()
+        self.settings.output.print_status(
+            f'{statistics["hits"]} cache hits and {statistics["misses"]} cache misses for intermediate search results'
+        )
+
+        # Remove the loaded dataset in preparation for the next search. Its cached results can not be used anymore.
+        if not self.settings.keep_dataset_loaded:
+            self.log_messages = None
+            self.cache.clear()
+            self.shared_search.release()
+
+    def close(self):
+        # Stops the search workers and removes the dataset from shared memory.
+        self.shared_search.close()
+
+    def search_error(self, error_line_id: int, shared_results: list = None) -> RootCauseResult:
+        self.metrics = Metrics.for_output(self.settings.output, 'search', error_line_id=int(error_line_id))
+        error = self.log_messages.get_by_id(error_line_id)
+        for number, strategy in enumerate(self.settings.strategies):
+            with self.metrics.phase(f'strategy {number}'):
+                shared_result = None if shared_results is None else shared_results[number]
+                self.search_strategy(error_line_id, error, strategy, shared_result)
         self.add_to_root_cause(error_line_id, 0)
 
-        self.root_cause = sorted(self.root_cause, key=lambda entry: entry.line_id)
+        self.root_cause = RootCauseResult(sorted(self.root_cause, key=lambda entry: entry.line_id), self.metrics)
         self.settings.output.print_root_cause(error_line_id, self.root_cause)
-
-        # Remove the loaded dataset in preparation for the next search.
-        self.log_messages = None
+        self.settings.output.print_metrics(self.metrics)
 
         return self.root_cause
 
-    def search_strategy(self, error_line_id: int, error: pd.Series, strategy: SearchStrategy):
+    def search_strategy(self, error_line_id: int, error: pd.Series, strategy: SearchStrategy, shared_result=None):
         self.settings.output.print_headline(
             f'Trying search strategy "{strategy.intersection_occurrences_col}|{strategy.intersection_col}|{strategy.hidden_occurrences_col}|{strategy.uniqueness_col}|{strategy.max_noise}"'
         )
 
-        # Look for occurrences of the same error for creating the intersection.
-        intersection_occurrences = self.log_messages.get_by_value(
-            strategy.intersection_occurrences_col, error[strategy.intersection_occurrences_col]
-        )
-        self.settings.output.print_status(
-            f'{len(intersection_occurrences)} error occurrences found. They are used to create a intersection of all time windows before the error'
-        )
-        if len(intersection_occurrences) < 2:
+        if shared_result is None:
+            candidates = self.strategy_candidates(error_line_id, error, strategy)
+        else:
+            candidates = self.shared_strategy_candidates(shared_result)
+        if candidates is None:
             return
 
+        added_count = 0
+        with self.metrics.phase('add_to_root_cause'):
+            for line_id, found_with_noise in candidates:
+                if self.add_to_root_cause(line_id, found_with_noise, strategy):
+                    added_count += 1
+
+        self.settings.output.print_completion(f'{added_count} lines added to root cause')
+
+    def strategy_candidates(self, error_line_id: int, error: pd.Series,
+                            strategy: SearchStrategy) -> list[tuple[int, int]]:
         # Create intersection of time windows before the occurrences of the same error.
-        intersection = self.log_messages.time_windows_intersection(
-            strategy.intersection_col, intersection_occurrences['timestamp'], strategy.window_seconds
-        )
-        self.settings.output.print_status(f'{len(intersection)} values in intersection of time windows found')
-        if len(intersection) < 2:
-            return
+        intersection = self.strategy_intersection(error, strategy)
+        if intersection is None:
+            return None
+
+        # Count values outside the time windows before the hidden occurrences of the same error.
+        outside_windows_count = self.strategy_outside_windows_count(error, strategy)
+        if outside_windows_count is None:
+            return None
+
+        with self.metrics.phase('candidate_filtering'):
+            return self.filter_candidates(error_line_id, error, strategy, intersection, outside_windows_count)
 
+    def filter_candidates(self, error_line_id: int, error: pd.Series, strategy: SearchStrategy, intersection: list,
+                          outside_windows_count: pd.Series) -> list[tuple[int, int]]:
         # Extract time window before error.
         error_window = self.log_messages.time_window(error['timestamp'], strategy.window_seconds)
 
-        # Find error occurrences for time windows, that are skipped in uniqueness check of root cause candidates
-        hidden_occurrences = self.log_messages.get_by_value(
-            strategy.hidden_occurrences_col, error[strategy.hidden_occurrences_col]
-        )
+        # The distinct values of the uniqueness column are taken for each value of the intersection in its order. The
+        # lines are ordered by the position of their intersection value instead of filtering the window for each value.
+        positions = {value: position for position, value in enumerate(intersection)}
+        window = pd.DataFrame({
+            'position': error_window[strategy.intersection_col].astype(object).map(positions),
+            'candidate': error_window[strategy.uniqueness_col]
+        })
+        window = window[window['position'].notna()].sort_values('position', kind='stable')
+        window = window.drop_duplicates(['position', 'candidate'])
+
+        # Lines removed by the service or content filter can not become root cause candidates. They are removed after
+        # the first line of each value was taken, so that a later line with the same value does not take their place.
+        window = window[~(
+            self.settings.service_filter_pattern.matches_series(error_window.loc[window.index, 'service'])
+            | self.settings.content_filter_pattern.matches_series(error_window.loc[window.index, 'content'])
+        )]
+
+        candidates = []
+        for line_id, candidate in window['candidate'].items():
+            if len(outside_windows_count) > 0 and type(candidate) != type(outside_windows_count.index[0]):
+                raise TypeError('Uniqueness column has different data type.')
+            if line_id == error_line_id:
+                continue
+
+            found_with_noise = outside_windows_count.get(candidate, 0)
+            if found_with_noise <= strategy.max_noise:
+                candidates.append((line_id, found_with_noise))
+
+        return candidates
+
+    def shared_strategy_candidates(self, shared_result) -> list[tuple[int, int]]:
+        # Waits for the result of a search worker.
+        with self.metrics.phase('shared_search'):
+            statuses, candidates = shared_result.result()
+        for status in statuses:
+            self.settings.output.print_status(status)
+        return candidates
+
+    def strategy_intersection(self, error: pd.Series, strategy: SearchStrategy) -> list:
+        # Look for occurrences of the same error for creating the intersection.
+        occurrences = self.occurrence_timestamps(strategy.intersection_occurrences_col, error)
         self.settings.output.print_status(
-            f'{len(hidden_occurrences)} error occurrences found. They are used to mark the time windows that are skipped in the uniqueness check for root cause candidates'
+            f'{len(occurrences)} error occurrences found. They are used to create a intersection of all time windows before the error'
         )
-        if len(hidden_occurrences) < 2:
-            return
+        if len(occurrences) < 2:
+            return None
 
-        # Count values outside time windows.
-        outside_windows_count = self.log_messages.count_outside_time_windows(
-            strategy.uniqueness_col, hidden_occurrences['timestamp'], strategy.window_seconds
+        key = (
+            'intersection',
+            strategy.intersection_occurrences_col,
+            error[strategy.intersection_occurrences_col],
+            strategy.intersection_col,
+            strategy.window_seconds,
+            self.log_messages.version
         )
+        with self.metrics.phase('window_intersection'):
+            intersection = self.cache.get(key, lambda: self.log_messages.time_windows_intersection(
+                strategy.intersection_col, occurrences, strategy.window_seconds, 2
+            ))
+        self.settings.output.print_status(f'{len(intersection)} values in intersection of time windows found')
+        if len(intersection) < 2:
+            return None
 
-        #
-        added_count = 0
-        for intersection_value in intersection:
-            candidates = error_window[(error_window[strategy.intersection_col] == intersection_value)]
-            candidates = candidates[strategy.uniqueness_col].drop_duplicates()
+        return intersection
 
-            for line_id, candidate in candidates.items():
-                if type(candidate) != type(outside_windows_count.index[0]):
-                    raise TypeError('Uniqueness column has different data type.')
-                if line_id == error_line_id:
-                    continue
+    def strategy_outside_windows_count(self, error: pd.Series, strategy: SearchStrategy) -> pd.Series:
+        # Find error occurrences for time windows, that are skipped in uniqueness check of root cause candidates
+        occurrences = self.occurrence_timestamps(strategy.hidden_occurrences_col, error)
+        self.settings.output.print_status(
+            f'{len(occurrences)} error occurrences found. They are used to mark the time windows that are skipped in the uniqueness check for root cause candidates'
+        )
+        if len(occurrences) < 2:
+            return None
 
-                found_with_noise = outside_windows_count.get(candidate, 0)
-                if found_with_noise <= strategy.max_noise:
-                    if self.add_to_root_cause(line_id, found_with_noise, strategy):
-                        added_count += 1
+        key = (
+            'outside_windows_count',
+            strategy.hidden_occurrences_col,
+            error[strategy.hidden_occurrences_col],
+            strategy.uniqueness_col,
+            strategy.window_seconds,
+            self.log_messages.version
+        )
+        with self.metrics.phase('noise_counting'):
+            return self.cache.get(key, lambda: self.log_messages.count_outside_time_windows(
+                strategy.uniqueness_col, occurrences, strategy.window_seconds
+            ))
 
-        self.settings.output.print_completion(f'{added_count} lines added to root cause')
+    def occurrence_timestamps(self, column: str, error: pd.Series) -> pd.Series:
+        key = ('occurrences', column, error[column], self.log_messages.version)
+        with self.metrics.phase('occurrence_lookup'):
+            return self.cache.get(key, lambda: self.log_messages.get_timestamps_by_value(column, error[column]))
 
     def add_to_root_cause(self, line_id: int, found_with_noise: int, strategy: SearchStrategy = None) -> bool:
         log_message = self.log_messages.get_by_id(line_id)
 
-        for fil in self.settings.service_filter:
-            if re.search(fil, str(log_message['service'])) is not None:
-                return False
+        if self.settings.service_filter_pattern.matches(str(log_message['service'])):
+            return False
 
-        for fil in self.settings.content_filter:
-            if re.search(fil, str(log_message['content'])) is not None:
-                return False
+        if self.settings.content_filter_pattern.matches(str(log_message['content'])):
+            return False
 
         if self.settings.duplicate_filter_col is not None:
-            existing_column_values = [entry.message[self.settings.duplicate_filter_col] for entry in self.root_cause]
-            if log_message[self.settings.duplicate_filter_col] in existing_column_values:
+            if log_message[self.settings.duplicate_filter_col] in self.root_cause_values:
                 return False
 
         if strategy is not None:
             strategy = copy.deepcopy(strategy)
             strategy.found_with_noise = found_with_noise
 
-        for entry in self.root_cause:
-            if entry.line_id == line_id and strategy is not None:
-                entry.strategies.append(strategy)
-                return True
+        entry = self.root_cause_entries.get(line_id)
+        if entry is not None and strategy is not None:
+            entry.strategies.append(strategy)
+            return True
 
         strategies = []
         if strategy is not None:
             strategies = [strategy]
 
-        self.root_cause.append(RootCauseEntry(line_id, log_message, strategies))
+        entry = RootCauseEntry(line_id, log_message, strategies, self.log_messages.templates)
+        self.root_cause.append(entry)
+        self.root_cause_entries[line_id] = entry
+        if self.settings.duplicate_filter_col is not None:
+            self.root_cause_values.add(log_message[self.settings.duplicate_filter_col])
         return True
+
+    def clear_root_cause(self):
+        self.root_cause = []
+        self.root_cause_entries = {}  # Entries by their line id
+        self.root_cause_values = set()  # Values of the entries in the duplicate filter column
@@ -0,0 +1,166 @@
+import argparse
+from contextlib import contextmanager
+import copy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from output import DisplayNoOutput, DisplayNotebookOutput
+import queue
+from search import RootCauseSearch
+from settings import parse_strategy, SearchSettings, SearchStrategy
+import time
+
+
+class SearchServer(ThreadingHTTPServer):
+    request_queue_size = 128  # Connections waiting to be accepted while searches are running
+
+    def __init__(
+            self,
+            address: tuple[str, int],
+            settings: SearchSettings,
+            max_concurrent_searches: int = 4,
+            wait_seconds: float = 30
+    ):
+        # The dataset is loaded once and shared by a pool of searches, which only read it. Each search handles one
+        # request at a time, so the size of the pool limits the number of concurrent searches.
+        if max_concurrent_searches < 1:
+            raise ValueError('Number of concurrent searches must be at least 1.')
+
+        # The settings of the caller are not changed.
+        settings = copy.copy(settings)
+        settings.keep_dataset_loaded = True
+        self.settings = settings
+        self.wait_seconds = wait_seconds
+
+        root_cause_search = RootCauseSearch(settings)
+        self.log_messages = root_cause_search.log_messages
+        self.log_messages.create_indexes(list({
+            column for strategy in settings.strategies for column in [
+                strategy.intersection_occurrences_col, strategy.intersection_col, strategy.hidden_occurrences_col
+            ]
+        }))
+
+        self.searches = queue.Queue()
+        self.searches.put(root_cause_search)
+        for _ in range(max_concurrent_searches - 1):
+            self.searches.put(RootCauseSearch(settings, self.log_messages))
+
+        super().__init__(address, SearchRequestHandler)
+
+    @contextmanager
+    def root_cause_search(self):
+        # Raises queue.Empty, if no search became free while waiting.
+        root_cause_search = self.searches.get(timeout=self.wait_seconds)
+        try:
+            yield root_cause_search
+        finally:
+            self.searches.put(root_cause_search)
+
+
+class SearchRequestHandler(BaseHTTPRequestHandler):
+    server: SearchServer
+    latency_ms = 0.0
+
+    def do_GET(self):
+        start_time = time.perf_counter()
+        if self.path == '/health':
+            self.send_json(200, {'status': 'ok', 'log_messages': len(self.server.log_messages.log_messages)}, start_time)
+        else:
+            self.send_json(404, {'error': f'Unknown path {self.path}.'}, start_time)
+
+    def do_POST(self):
+        start_time = time.perf_counter()
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            if self.path == '/search':
+                error_line_ids = [int(request['line_id'])]
+            elif self.path == '/search_many':
+                error_line_ids = [int(line_id) for line_id in request['line_ids']]
+            else:
+                self.send_json(404, {'error': f'Unknown path {self.path}.'}, start_time)
+                return
+        except (ValueError, TypeError, KeyError):
+            self.send_json(400, {'error': 'Request must be a JSON object with "line_id" or "line_ids".'}, start_time)
+            return
+
+        try:
+            with self.server.root_cause_search() as root_cause_search:
+                root_causes = root_cause_search.search_many(error_line_ids)
+        except queue.Empty:
+            self.send_json(503, {'error': 'All searches are busy.'}, start_time)
+            return
+        except KeyError as error:
+            self.send_json(404, {'error': f'Line {error} not found.'}, start_time)
+            return
+
+        root_causes = {
+            error_line_id: [entry.to_dict() for entry in root_cause] for error_line_id, root_cause in root_causes.items()
+        }
+        if self.path == '/search':
+            self.send_json(200, {'line_id': error_line_ids[0], 'root_cause': root_causes[error_line_ids[0]]}, start_time)
+        else:
+            self.send_json(200, {'root_causes': root_causes}, start_time)
+
+    def send_json(self, status: int, response: dict, start_time: float):
+        # The latency covers reading the request and creating the response.
+        self.latency_ms = (time.perf_counter() - start_time) * 1000
+        response['latency_ms'] = round(self.latency_ms, 3)
+        body = json.dumps(response).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_request(self, code='-', size='-'):
+        self.log_message('"%s" %s %.1f ms', self.requestline, str(code), self.latency_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serves root cause searches in a prepared dataset as JSON over HTTP.')
+    parser.add_argument('--dataset-name', required=True)
+    parser.add_argument('--source-csv-file', required=True)
+    parser.add_argument('--storage-dir', required=True)
+    parser.add_argument('--drain-config-file', required=True)
+    parser.add_argument('--storage-format', default='csv')
+    parser.add_argument(
+        '--strategy', type=parse_strategy, action='append', default=[],
+        help='intersection_occurrences_col|intersection_col|hidden_occurrences_col|uniqueness_col|max_noise|window_seconds'
+    )
+    parser.add_argument('--service-filter', action='append', default=[])
+    parser.add_argument('--content-filter', action='append', default=[])
+    parser.add_argument('--parallel-processing', action='store_true')
+    parser.add_argument('--memory-map', action='store_true')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-concurrent-searches', type=int, default=4)
+    args = parser.parse_args()
+
+    settings = SearchSettings(
+        dataset_name=args.dataset_name,
+        source_csv_file=args.source_csv_file,
+        storage_dir=args.storage_dir,
+        drain_config_file=args.drain_config_file,
+        strategies=args.strategy or [SearchStrategy()],
+        service_filter=args.service_filter,
+        content_filter=args.content_filter,
+        output=DisplayNotebookOutput(),
+        parallel_processing=args.parallel_processing,
+        storage_format=args.storage_format,
+        memory_map=args.memory_map
+    )
+    server = SearchServer((args.host, args.port), settings, args.max_concurrent_searches)
+
+    # Concurrent searches would mix their output, so only the requests are logged while serving.
+    server.settings.output = DisplayNoOutput()
+    print(f'Serving root cause searches on http://{args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,10 @@
+import argparse
 import functools
+import numpy as np
 import os
 from output import DisplayOutput
+import pandas as pd
+import re
 
 
 class SearchStrategy:
@@ -31,6 +35,58 @@ class SearchStrategy:
         self.max_noise = max_noise
         self.found_with_noise = None
 
+    def to_dict(self) -> dict:
+        return {
+            'intersection_occurrences_col': self.intersection_occurrences_col,
+            'intersection_col': self.intersection_col,
+            'hidden_occurrences_col': self.hidden_occurrences_col,
+            'uniqueness_col': self.uniqueness_col,
+            'max_noise': self.max_noise,
+            'window_seconds': self.window_seconds,
+            'found_with_noise': None if self.found_with_noise is None else int(self.found_with_noise)
+        }
+
+
+def parse_strategy(text: str) -> SearchStrategy:
+    # Same format as the strategies in the search output, but with the window seconds as last value.
+    values = text.split('|')
+    if len(values) != 6:
+        raise argparse.ArgumentTypeError(f'Strategy "{text}" must have six values separated by "|".')
+    return SearchStrategy(*values[:4], max_noise=int(values[4]), window_seconds=int(values[5]))
+
+
+class FilterPattern:
+    def __init__(self, patterns: list[str]):
+        # Searching one combined regular expression is faster than searching all patterns one after another. Patterns
+        # with back-references, named groups, conditionals or global flags can not be combined, because they would
+        # change their meaning. Other combinations, which can not be compiled, are searched separately as well.
+        self.expressions = [re.compile(pattern) for pattern in patterns]
+        if len(patterns) > 1 and not any(
+                re.search(r'\\\d|\(\?P[<=]|\(\?\(|^\(\?[a-zA-Z]+\)', pattern) for pattern in patterns
+        ):
+            try:
+                self.expressions = [re.compile('|'.join(f'(?:{pattern})' for pattern in patterns))]
+            except re.error:
+                pass
+
+    def matches(self, text: str) -> bool:
+        for expression in self.expressions:
+            if expression.search(text) is not None:
+                return True
+        return False
+
+    def matches_series(self, series: pd.Series) -> np.ndarray:
+        if len(self.expressions) == 0:
+            return np.zeros(len(series), dtype=bool)
+
+        # Each distinct value is only searched once.
+        values = series.astype(object).to_numpy()
+        matched = {}
+        for value in values:
+            if value not in matched:
+                matched[value] = self.matches(str(value))
+        return np.fromiter((matched[value] for value in values), dtype=bool, count=len(values))
+
 
 class SearchSettings:
     def __init__(
@@ -45,7 +101,34 @@ class SearchSettings:
             output: DisplayOutput,
             duplicate_filter_col: str = 'service_template_id',
             parallel_processing: bool = False,
+            keep_dataset_loaded: bool = False,
+            storage_format: str = 'csv',
+            memory_map: bool = False,
+            cache_max_entries: int = 256,
+            cache_max_bytes: int = 512 * 1024 ** 2,
+            chunk_size: int = None,
+            clustering_shards: int = 1,
+            shard_by: str = 'service',
+            search_workers: int = 1,
+            content_cache_max_entries: int = 100_000,
     ):
+        allowed_formats = ['csv', 'parquet', 'feather']
+        if storage_format not in allowed_formats:
+            raise ValueError(f'Storage format must be one of {allowed_formats}.')
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError('Chunk size must be at least 1.')
+        if clustering_shards < 1:
+            raise ValueError('Number of clustering shards must be at least 1.')
+        if clustering_shards > 1 and chunk_size is not None:
+            raise ValueError('Clustering shards can not be used for preparing the dataset in chunks.')
+        allowed_shard_keys = ['service', 'hash']
+        if shard_by not in allowed_shard_keys:
+            raise ValueError(f'Shard key must be one of {allowed_shard_keys}.')
+        if search_workers < 1:
+            raise ValueError('Number of search workers must be at least 1.')
+        if content_cache_max_entries < 0:
+            raise ValueError('Number of content cache entries must be at least 0.')
+
         self.validated_settings = {
             'storage_dir': storage_dir,
             'source_csv_file': source_csv_file,
@@ -58,8 +141,26 @@ class SearchSettings:
         self.content_filter = content_filter
         self.duplicate_filter_col = duplicate_filter_col
         self.parallel_processing = parallel_processing
+        self.keep_dataset_loaded = keep_dataset_loaded
+        self.storage_format = storage_format
+        self.memory_map = memory_map
+        self.cache_max_entries = cache_max_entries
+        self.cache_max_bytes = cache_max_bytes
+        self.chunk_size = chunk_size
+        self.clustering_shards = clustering_shards
+        self.shard_by = shard_by
+        self.search_workers = search_workers
+        self.content_cache_max_entries = content_cache_max_entries
         self.output = output
 
+    @functools.cached_property
+    def service_filter_pattern(self) -> FilterPattern:
+        return FilterPattern(self.service_filter)
+
+    @functools.cached_property
+    def content_filter_pattern(self) -> FilterPattern:
+        return FilterPattern(self.content_filter)
+
     @functools.cached_property
     def storage_dir(self) -> str:
         if not os.path.isdir(self.validated_settings['storage_dir']):
@@ -72,19 +173,33 @@ class SearchSettings:
             raise ValueError('Source file with the unprepared log lines does not exist.')
         return self.validated_settings['source_csv_file']
 
-    @functools.cached_property
-    def pre_clustering_csv_file(self) -> str:
-        return self.storage_dir + f'/{self.dataset_name}.pre_clustering.csv'
+    def pre_clustering_file(self) -> str:
+        return self.storage_file('pre_clustering')
+
+    def pre_clustering_file_exists(self) -> bool:
+        return os.path.isfile(self.pre_clustering_file())
 
-    def pre_clustering_csv_file_exists(self) -> bool:
-        return os.path.isfile(self.pre_clustering_csv_file)
+    def post_clustering_file(self) -> str:
+        return self.storage_file('post_clustering')
+
+    def post_clustering_file_exists(self) -> bool:
+        return os.path.isfile(self.post_clustering_file())
 
     @functools.cached_property
-    def post_clustering_csv_file(self) -> str:
-        return self.storage_dir + f'/{self.dataset_name}.post_clustering.csv'
+    def templates_file(self) -> str:
+        return self.storage_dir + f'/{self.dataset_name}.templates.csv'
+
+    def templates_file_exists(self) -> bool:
+        return os.path.isfile(self.templates_file)
 
-    def post_clustering_csv_file_exists(self) -> bool:
-        return os.path.isfile(self.post_clustering_csv_file)
+    def storage_file(self, stage: str) -> str:
+        file = self.storage_dir + f'/{self.dataset_name}.{stage}.{self.storage_format}'
+
+        # Storage directories created before the storage format was configurable only contain CSV files.
+        csv_file = self.storage_dir + f'/{self.dataset_name}.{stage}.csv'
+        if not os.path.isfile(file) and os.path.isfile(csv_file):
+            return csv_file
+        return file
 
     @functools.cached_property
     def drain_config_file(self) -> str:
@@ -105,3 +220,10 @@ class SearchSettings:
 
     def temporary_drain_state_file_exists(self) -> bool:
         return os.path.isfile(self.temporary_drain_state_file)
+
+    @functools.cached_property
+    def live_drain_state_file(self) -> str:
+        return self.storage_dir + f'/{self.dataset_name}.live.drain.bin'
+
+    def live_drain_state_file_exists(self) -> bool:
+        return os.path.isfile(self.live_drain_state_file)
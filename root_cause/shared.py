@@ -0,0 +1,268 @@
+from messages import LogMessages
+import numpy as np
+import pandas as pd
+from settings import SearchSettings, SearchStrategy
+import weakref
+
+
+class SharedDataset:
+    attached = None  # Spec, memory blocks and arrays of the dataset, which this worker process is attached to
+
+    def __init__(self, log_messages: LogMessages, settings: SearchSettings):
+        # The columns needed by the strategies are exported once into shared memory. Values are represented by their
+        # integer codes and the service and content filters by a mask of the filtered rows, so the worker processes
+        # neither need the strings nor a copy of the data frame.
+        from multiprocessing import shared_memory
+
+        self.version = log_messages.version
+        timestamps, order = log_messages.get_timestamp_index()
+        arrays = {
+            'timestamps': log_messages.log_messages['timestamp'].to_numpy(dtype='datetime64[ns]').view('int64'),
+            'line_ids': log_messages.log_messages.index.to_numpy(dtype=np.int64),
+            'filtered': log_messages.matching_rows('service', settings.service_filter_pattern.matches_series)
+                        | log_messages.matching_rows('content', settings.content_filter_pattern.matches_series)
+        }
+        if order is not None:
+            arrays['sorted_timestamps'] = timestamps
+            arrays['order'] = order
+        for column in sorted({column for strategy in settings.strategies for column in [
+            strategy.intersection_occurrences_col, strategy.intersection_col, strategy.hidden_occurrences_col,
+            strategy.uniqueness_col
+        ]}):
+            offsets, positions = log_messages.get_value_index(column)
+            arrays[f'{column}.codes'] = log_messages.get_value_codes(column)
+            arrays[f'{column}.offsets'] = offsets
+            arrays[f'{column}.positions'] = positions
+
+        self.blocks = []
+        self.spec = {}  # Name, data type and shape of the memory block of each array
+        for name, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[:] = array
+            self.blocks.append(block)
+            self.spec[name] = (block.name, array.dtype.str, array.shape)
+
+        # The memory blocks are removed when the dataset is released, at the latest when the process exits.
+        self.finalizer = weakref.finalize(self, SharedDataset.release_blocks, self.blocks)
+
+    def release(self):
+        self.finalizer()
+
+    @staticmethod
+    def release_blocks(blocks: list):
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    @staticmethod
+    def attach(spec: dict) -> dict[str, np.ndarray]:
+        # Each worker process attaches once to the current dataset. The arrays are views on the shared memory.
+        from multiprocessing import shared_memory
+
+        if SharedDataset.attached is not None and SharedDataset.attached[0] != spec:
+            blocks = SharedDataset.attached[1]
+            SharedDataset.attached = None
+            for block in blocks:
+                block.close()
+
+        if SharedDataset.attached is None:
+            blocks = [shared_memory.SharedMemory(name=name) for name, _, _ in spec.values()]
+            arrays = {
+                key: np.ndarray(shape, dtype, buffer=block.buf)
+                for (key, (_, dtype, shape)), block in zip(spec.items(), blocks)
+            }
+            SharedDataset.attached = (spec, blocks, arrays)
+
+        return SharedDataset.attached[2]
+
+
+class SharedLogMessages:
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        # The operations of LogMessages, which are needed by the search strategies, on the integer codes of a shared
+        # dataset. Results are codes instead of values and row positions instead of rows.
+        self.arrays = arrays
+        self.timestamps = arrays['timestamps']
+        self.sorted_timestamps = arrays.get('sorted_timestamps', self.timestamps)
+        self.order = arrays.get('order')
+
+    def categories_count(self, column: str) -> int:
+        return len(self.arrays[f'{column}.offsets']) - 1
+
+    def value_positions(self, column: str, code: int) -> np.ndarray:
+        offsets, positions = self.arrays[f'{column}.offsets'], self.arrays[f'{column}.positions']
+        if code < 0:
+            return positions[:0]
+        return positions[offsets[code]:offsets[code + 1]]
+
+    def get_timestamps_by_value(self, column: str, position: int) -> np.ndarray:
+        # Timestamps of all rows with the same value as the row at the position.
+        code = self.arrays[f'{column}.codes'][position]
+        return self.timestamps[self.value_positions(column, code)]
+
+    def count_outside_time_windows(self, column: str, end_times: np.ndarray, seconds: int) -> np.ndarray:
+        # Same as LogMessages.count_outside_time_windows, but counted for each code.
+        end_times = np.sort(np.append(end_times, self.sorted_timestamps[-1]))
+        start_times = end_times - pd.Timedelta(seconds=seconds).value
+
+        new_window = start_times[1:] > end_times[:-1]
+        starts, ends = self.time_window_positions(
+            start_times[np.append(True, new_window)], end_times[np.append(new_window, True)]
+        )
+
+        sweep = np.zeros(len(self.timestamps) + 1, dtype=np.int64)
+        np.add.at(sweep, starts, 1)
+        np.add.at(sweep, ends, -1)
+        inside = np.cumsum(sweep[:-1]) > 0
+        if self.order is not None:
+            inside[self.order] = inside.copy()
+
+        codes = self.arrays[f'{column}.codes']
+        outside_codes = codes[~inside]
+        return np.bincount(outside_codes[outside_codes >= 0], minlength=self.categories_count(column))
+
+    def time_windows_intersection(self, column: str, end_times: np.ndarray, seconds: int,
+                                  min_values: int = 1) -> np.ndarray:
+        # Same as LogMessages.time_windows_intersection for at least two end times.
+        starts, ends = self.time_window_positions(end_times - pd.Timedelta(seconds=seconds).value, end_times)
+
+        codes = self.arrays[f'{column}.codes']
+        intersection = np.unique(self.codes_between_positions(codes, starts[0], ends[0]))
+        for start, end in zip(starts[1:], ends[1:]):
+            if len(intersection) < min_values:
+                break
+            window_codes = np.unique(self.codes_between_positions(codes, start, end))
+            intersection = np.intersect1d(intersection, window_codes, assume_unique=True)
+
+        first_window_codes = self.codes_between_positions(codes, starts[0], ends[0], keep_order=True)
+        first_window_codes = first_window_codes[np.isin(first_window_codes, intersection)]
+        _, first_positions = np.unique(first_window_codes, return_index=True)
+        return first_window_codes[np.sort(first_positions)]
+
+    def time_window_positions(self, start_times: np.ndarray, end_times: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        return (
+            np.searchsorted(self.sorted_timestamps, start_times, side='left'),
+            np.searchsorted(self.sorted_timestamps, end_times, side='right')
+        )
+
+    def rows_between_positions(self, start: int, end: int) -> np.ndarray:
+        if self.order is None:
+            return np.arange(start, end)
+        return np.sort(self.order[start:end])
+
+    def codes_between_positions(self, codes: np.ndarray, start: int, end: int, keep_order: bool = False) -> np.ndarray:
+        if self.order is None:
+            return codes[start:end]
+        if keep_order:
+            return codes[np.sort(self.order[start:end])]
+        return codes[self.order[start:end]]
+
+
+class SharedStrategySearch:
+    def __init__(self, settings: SearchSettings):
+        # The strategies of the searched errors are evaluated concurrently by worker processes. They attach to the
+        # dataset in shared memory instead of receiving a copy of it. The dataset is only shared again, if it changed.
+        self.settings = settings
+        self.dataset = None
+        self.executor = None
+
+    def submit(self, log_messages: LogMessages, error_line_id: int) -> list:
+        # Returns a future for each strategy with the status messages and the candidates of the strategy.
+        from concurrent.futures import ProcessPoolExecutor
+
+        if self.dataset is None or self.dataset.version != log_messages.version:
+            self.release()
+            self.dataset = SharedDataset(log_messages, self.settings)
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.settings.search_workers)
+
+        error_position = log_messages.log_messages.index.get_loc(error_line_id)
+        return [
+            self.executor.submit(
+                SharedStrategySearch.strategy_candidates, self.dataset.spec, error_line_id, error_position, strategy
+            )
+            for strategy in self.settings.strategies
+        ]
+
+    def release(self):
+        if self.dataset is not None:
+            self.dataset.release()
+            self.dataset = None
+
+    def close(self):
+        self.release()
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    @staticmethod
+    def strategy_candidates(spec: dict, error_line_id: int, error_position: int,
+                            strategy: SearchStrategy) -> tuple[list[str], list[tuple[int, int]]]:
+        # Same steps as RootCauseSearch.strategy_candidates. Status messages are returned, because only the main
+        # process prints them.
+        log_messages = SharedLogMessages(SharedDataset.attach(spec))
+        statuses = []
+
+        occurrences = log_messages.get_timestamps_by_value(strategy.intersection_occurrences_col, error_position)
+        statuses.append(
+            f'{len(occurrences)} error occurrences found. They are used to create a intersection of all time windows before the error'
+        )
+        if len(occurrences) < 2:
+            return statuses, None
+
+        intersection = log_messages.time_windows_intersection(
+            strategy.intersection_col, occurrences, strategy.window_seconds, 2
+        )
+        statuses.append(f'{len(intersection)} values in intersection of time windows found')
+        if len(intersection) < 2:
+            return statuses, None
+
+        occurrences = log_messages.get_timestamps_by_value(strategy.hidden_occurrences_col, error_position)
+        statuses.append(
+            f'{len(occurrences)} error occurrences found. They are used to mark the time windows that are skipped in the uniqueness check for root cause candidates'
+        )
+        if len(occurrences) < 2:
+            return statuses, None
+
+        outside_windows_count = log_messages.count_outside_time_windows(
+            strategy.uniqueness_col, occurrences, strategy.window_seconds
+        )
+        candidates = SharedStrategySearch.filter_candidates(
+            log_messages, error_line_id, error_position, strategy, intersection, outside_windows_count
+        )
+        return statuses, candidates
+
+    @staticmethod
+    def filter_candidates(log_messages: SharedLogMessages, error_line_id: int, error_position: int,
+                          strategy: SearchStrategy, intersection: np.ndarray,
+                          outside_windows_count: np.ndarray) -> list[tuple[int, int]]:
+        # Same as RootCauseSearch.filter_candidates. Missing values have the code -1, so all codes are shifted by one
+        # for the lookup of their position in the intersection.
+        arrays = log_messages.arrays
+        error_timestamp = log_messages.timestamps[error_position]
+        starts, ends = log_messages.time_window_positions(
+            np.array([error_timestamp - pd.Timedelta(seconds=strategy.window_seconds).value]), np.array([error_timestamp])
+        )
+        rows = log_messages.rows_between_positions(starts[0], ends[0])
+
+        positions = np.full(log_messages.categories_count(strategy.intersection_col) + 1, -1, dtype=np.int64)
+        positions[intersection.astype(np.int64) + 1] = np.arange(len(intersection))
+        row_positions = positions[arrays[f'{strategy.intersection_col}.codes'][rows].astype(np.int64) + 1]
+        rows, row_positions = rows[row_positions >= 0], row_positions[row_positions >= 0]
+        order = np.argsort(row_positions, kind='stable')
+        rows, row_positions = rows[order], row_positions[order]
+
+        # Keep the first row of each pair of intersection position and candidate value.
+        candidate_codes = arrays[f'{strategy.uniqueness_col}.codes'][rows].astype(np.int64)
+        keys = row_positions * (log_messages.categories_count(strategy.uniqueness_col) + 1) + candidate_codes + 1
+        _, first_rows = np.unique(keys, return_index=True)
+        first_rows = np.sort(first_rows)
+        rows, candidate_codes = rows[first_rows], candidate_codes[first_rows]
+
+        # Filtered rows are removed after the first row of each pair was taken, like in RootCauseSearch.
+        unfiltered = ~arrays['filtered'][rows]
+        rows, candidate_codes = rows[unfiltered], candidate_codes[unfiltered]
+
+        line_ids = arrays['line_ids'][rows]
+        found_with_noise = np.where(candidate_codes >= 0, outside_windows_count[np.maximum(candidate_codes, 0)], 0)
+        keep = (line_ids != error_line_id) & (found_with_noise <= strategy.max_noise)
+        return list(zip(line_ids[keep].tolist(), found_with_noise[keep].tolist()))
@@ -0,0 +1,80 @@
+from collections.abc import Iterator
+import os
+import pandas as pd
+
+
+class StorageChunks:
+    def __init__(self, file: str, chunk_size: int):
+        self.file = file
+        self.chunk_size = chunk_size
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        # Compressed CSV files are decompressed while reading, based on their file extension.
+        if self.file.endswith('.parquet'):
+            from pyarrow import parquet
+            for batch in parquet.ParquetFile(self.file).iter_batches(batch_size=self.chunk_size):
+                yield self.with_line_id_index(batch.to_pandas())
+        elif self.file.endswith('.feather'):
+            import pyarrow
+            reader = pyarrow.ipc.open_file(pyarrow.memory_map(self.file))
+            for i in range(reader.num_record_batches):
+                yield self.with_line_id_index(reader.get_batch(i).to_pandas())
+        else:
+            yield from pd.read_csv(self.file, index_col='line_id', chunksize=self.chunk_size)
+
+    @staticmethod
+    def with_line_id_index(dataframe: pd.DataFrame) -> pd.DataFrame:
+        if 'line_id' in dataframe.columns:
+            return dataframe.set_index('line_id')
+        return dataframe
+
+
+class StorageChunkWriter:
+    def __init__(self, file: str):
+        # Chunks are written to a temporary file, so that an interrupted preparation does not leave an incomplete file.
+        self.file = file
+        self.temporary_file = file + '.tmp'
+        self.writer = None
+        self.schema = None
+        self.chunks_count = 0
+
+        if os.path.isfile(self.temporary_file):
+            os.remove(self.temporary_file)
+
+    def write(self, dataframe: pd.DataFrame):
+        dataframe = dataframe.rename_axis('line_id')
+        if self.file.endswith('.parquet'):
+            self.write_parquet(dataframe)
+        elif self.file.endswith('.feather'):
+            self.write_feather(dataframe.reset_index())
+        else:
+            dataframe.to_csv(self.temporary_file, mode='a', header=self.chunks_count == 0)
+        self.chunks_count += 1
+
+    def write_parquet(self, dataframe: pd.DataFrame):
+        import pyarrow
+        from pyarrow import parquet
+
+        table = pyarrow.Table.from_pandas(dataframe, schema=self.schema, preserve_index=True)
+        if self.writer is None:
+            self.schema = table.schema
+            self.writer = parquet.ParquetWriter(self.temporary_file, self.schema)
+        self.writer.write_table(table)
+
+    def write_feather(self, dataframe: pd.DataFrame):
+        import pyarrow
+
+        table = pyarrow.Table.from_pandas(dataframe, schema=self.schema, preserve_index=False)
+        if self.writer is None:
+            # Feather files are Arrow IPC files, which can be written one record batch after another.
+            self.schema = table.schema
+            options = pyarrow.ipc.IpcWriteOptions(compression='lz4')
+            self.writer = pyarrow.ipc.new_file(self.temporary_file, self.schema, options=options)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.chunks_count == 0:
+            raise ValueError('Dataset does not contain any log messages.')
+        if self.writer is not None:
+            self.writer.close()
+        os.replace(self.temporary_file, self.file)
@@ -0,0 +1,43 @@
+import os
+import sys
+
+# The modules of the root cause search import each other by their module names.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'root_cause'))
+from output import DisplayNoOutput
+import pandas as pd
+import pytest
+from settings import SearchSettings, SearchStrategy
+
+DRAIN_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'drain3.ini')
+
+
+def tiny_log_lines(line_ids: range) -> pd.DataFrame:
+    # A tiny log, in which each error is preceded by the same warning of another service.
+    lines = []
+    for line_id in line_ids:
+        if line_id % 50 == 49:
+            service, content = 'Storage', f'Disk full on volume {line_id % 3}'
+        elif line_id % 50 == 48:
+            service, content = 'Database', f'Connection to replica {line_id % 7} lost'
+        else:
+            service, content = f'Service{line_id % 4}', f'Request handled in {line_id % 5} ms'
+        timestamp = pd.Timestamp('2023-01-01 00:00:00.001') + pd.Timedelta(milliseconds=100 * line_id)
+        lines.append((line_id, timestamp.strftime('%Y-%m-%d %H:%M:%S.%f'), service, content))
+    return pd.DataFrame(lines, columns=['line_id', 'timestamp', 'service', 'content'])
+
+
+@pytest.fixture
+def settings(tmp_path) -> SearchSettings:
+    source_csv_file = tmp_path / 'tiny.source.csv'
+    tiny_log_lines(range(300)).to_csv(source_csv_file, index=False)
+    return SearchSettings(
+        dataset_name='tiny',
+        source_csv_file=str(source_csv_file),
+        storage_dir=str(tmp_path),
+        drain_config_file=DRAIN_CONFIG_FILE,
+        strategies=[SearchStrategy(window_seconds=1)],
+        service_filter=[],
+        content_filter=[],
+        output=DisplayNoOutput(),
+        keep_dataset_loaded=True
+    )
@@ -0,0 +1,19 @@
+from cache import ContentCache
+
+
+def test_content_cache_creates_missing_values_at_once():
+    created = []
+
+    def create(contents: list[str]) -> list[str]:
+        created.append(contents)
+        return [content.upper() for content in contents]
+
+    cache = ContentCache(2)
+    assert cache.get_many(['a', 'b', 'a'], create) == {'a': 'A', 'b': 'B'}
+    assert cache.get_many(['b', 'c'], create) == {'b': 'B', 'c': 'C'}
+    assert cache.get_many(['a', 'b'], create) == {'a': 'A', 'b': 'B'}
+
+    # The least recently used content is removed, when the cache is full.
+    assert created == [['a', 'b'], ['c'], ['a']]
+    assert (cache.hits, cache.misses) == (2, 4)
+    assert cache.hit_rate() == 2 / 6
@@ -0,0 +1,47 @@
+from live import LiveLogTail
+import shutil
+import time
+
+
+def wait_for_line_id(tail: LiveLogTail, line_id: int):
+    deadline = time.monotonic() + 30
+    while tail.last_line_id is None or tail.last_line_id < line_id:
+        assert tail.error is None
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_live_log_is_searched(settings, tmp_path):
+    live_csv_file = tmp_path / 'live.csv'
+    shutil.copyfile(settings.source_csv_file, live_csv_file)
+
+    with LiveLogTail(settings, str(live_csv_file), retention_seconds=600) as tail:
+        tail.start(poll_seconds=0.01)
+        wait_for_line_id(tail, 299)
+
+        assert [entry.line_id for entry in tail.search(299)] == [298, 299]
+
+
+def test_bad_live_lines_are_skipped(settings, tmp_path):
+    live_csv_file = tmp_path / 'live.csv'
+    shutil.copyfile(settings.source_csv_file, live_csv_file)
+
+    with LiveLogTail(settings, str(live_csv_file), retention_seconds=600) as tail:
+        tail.start(poll_seconds=0.01)
+        wait_for_line_id(tail, 299)
+
+        # A malformed timestamp, a timestamp before the one of the previous line and a line id, which was already read.
+        with open(live_csv_file, 'a') as file:
+            file.write(
+                '300,not a timestamp,Service0,Request handled in 0 ms\n'
+                '301,2023-01-01 00:00:30.101000,Service1,Request handled in 1 ms\n'
+                '302,2023-01-01 00:00:30.051000,Service2,Request handled in 2 ms\n'
+                '100,2023-01-01 00:00:30.201000,Service0,Request handled in 0 ms\n'
+                '348,2023-01-01 00:00:34.801000,Database,Connection to replica 5 lost\n'
+                '349,2023-01-01 00:00:34.901000,Storage,Disk full on volume 1\n'
+            )
+        wait_for_line_id(tail, 349)
+
+        assert tail.skipped_lines_count == 3
+        assert list(tail.snapshot().log_messages.index[-3:]) == [301, 348, 349]
+        assert [entry.line_id for entry in tail.search(349)] == [348, 349]
@@ -0,0 +1,130 @@
+from messages import LogMessages
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def grouped_service_template_ids(log_messages: LogMessages) -> list:
+    # Ids of the unordered pairs of service and template, as they were created with a row-wise frozenset and a groupby.
+    dataframe = log_messages.log_messages
+    return dataframe.groupby(
+        dataframe[['service', log_messages.template_column]].apply(frozenset, axis=1)
+    ).ngroup().add(1).to_list()
+
+
+def random_log_messages(rows: int, seed: int) -> pd.DataFrame:
+    random = np.random.default_rng(seed)
+    values = np.array([f'value{number}' for number in range(8)], dtype=object)
+    return pd.DataFrame({
+        'service': values[random.integers(0, 8, rows)],
+        'template': values[random.integers(0, 8, rows)]
+    })
+
+
+@pytest.mark.parametrize('dataframe', [
+    pd.DataFrame({
+        'service': ['a', 'b', 'a', 'x', 'b', 'y', 'a', None, 'c', None, 'c'],
+        'template': ['b', 'a', 'b', 'x', 'b', None, 'x', 'y', None, 'c', 'c']
+    }),
+    pd.DataFrame({
+        'service': ['Svc1', 'Svc2', 'Svc1', 'Svc2', None, 'Svc3'],
+        'template_id': [3, 1, 1, 3, 2, None]
+    }),
+    random_log_messages(1000, 0),
+    random_log_messages(1000, 1)
+], ids=['swapped_equal_and_missing', 'template_ids', 'random_0', 'random_1'])
+def test_service_template_ids_equal_grouped_ids(dataframe):
+    log_messages = LogMessages(dataframe)
+    expected = grouped_service_template_ids(log_messages)
+
+    log_messages.add_service_template_ids()
+
+    assert log_messages.log_messages['service_template_id'].to_list() == expected
+
+
+def test_service_template_ids_keep_known_ids():
+    first = LogMessages(pd.DataFrame({'service': ['a', 'b', 'c'], 'template': ['b', 'c', 'c']}))
+    known_ids = first.add_service_template_ids()
+
+    second = LogMessages(pd.DataFrame({'service': ['c', 'd', 'b'], 'template': ['b', 'd', 'a']}))
+    second.add_service_template_ids(known_ids)
+
+    assert second.log_messages['service_template_id'].to_list() == [
+        known_ids[frozenset(('b', 'c'))], len(known_ids) + 1, known_ids[frozenset(('a', 'b'))]
+    ]
+
+
+def filtered_outside_counts(dataframe: pd.DataFrame, column: str, end_times: pd.Series, seconds: int) -> dict:
+    # Reference, which removes the rows of each time window one after another.
+    end_times = end_times.to_list() + [dataframe['timestamp'].max()]
+    for end_time in end_times:
+        start_time = end_time - pd.Timedelta(seconds=seconds)
+        dataframe = dataframe[(dataframe['timestamp'] < start_time) | (dataframe['timestamp'] > end_time)]
+    counts = dataframe[column].value_counts()
+    return counts[counts > 0].to_dict()
+
+
+def merged_intersection(dataframe: pd.DataFrame, column: str, end_times: pd.Series, seconds: int) -> list:
+    # Reference, which merges the values of all time windows.
+    timestamps = dataframe['timestamp']
+    windows = [
+        dataframe[(timestamps >= end_time - pd.Timedelta(seconds=seconds)) & (timestamps <= end_time)]
+        for end_time in end_times
+    ]
+    if len(windows) == 0:
+        return []
+    if len(windows) == 1:
+        return windows[0][column].to_list()
+
+    intersection = windows[0][[column]]
+    for window in windows[1:]:
+        intersection = intersection.merge(window[[column]], on=[column], how='inner').drop_duplicates()
+    return intersection[column].to_list()
+
+
+def random_timed_log_messages(rows: int, seed: int, ordered: bool) -> pd.DataFrame:
+    random = np.random.default_rng(seed)
+    milliseconds = np.sort(random.integers(0, 60_000, rows))
+    if not ordered:
+        swapped = random.choice(rows, rows // 10, replace=False)
+        milliseconds[swapped] = random.integers(0, 60_000, len(swapped))
+    contents = np.array([f'content {number}' for number in range(12)] + [None], dtype=object)
+    template_ids = pd.array(random.integers(1, 9, rows), dtype='Int64')
+    template_ids[random.random(rows) < 0.05] = pd.NA
+    return pd.DataFrame({
+        'timestamp': pd.Timestamp('2023-01-01') + pd.to_timedelta(milliseconds, unit='ms'),
+        'content': pd.Categorical(contents[random.integers(0, 13, rows)]),
+        'service_template_id': template_ids
+    })
+
+
+def random_end_times(log_messages: LogMessages, seed: int) -> list[pd.Series]:
+    random = np.random.default_rng(seed)
+    return [
+        log_messages.log_messages['timestamp'].sample(windows_count, random_state=random.integers(1000))
+        for windows_count in [1, 2, 5]
+    ]
+
+
+@pytest.mark.parametrize('seed', range(6))
+@pytest.mark.parametrize('ordered', [True, False], ids=['ordered', 'unordered'])
+@pytest.mark.parametrize('column', ['content', 'service_template_id'])
+def test_count_outside_time_windows_equals_filtering(seed, ordered, column):
+    log_messages = LogMessages(random_timed_log_messages(2000, seed, ordered))
+    for end_times in random_end_times(log_messages, seed):
+        for seconds in [1, 3]:
+            counts = log_messages.count_outside_time_windows(column, end_times, seconds)
+
+            assert counts.to_dict() == filtered_outside_counts(log_messages.log_messages, column, end_times, seconds)
+
+
+@pytest.mark.parametrize('seed', range(6))
+@pytest.mark.parametrize('ordered', [True, False], ids=['ordered', 'unordered'])
+@pytest.mark.parametrize('column', ['content', 'service_template_id'])
+def test_time_windows_intersection_equals_merging(seed, ordered, column):
+    log_messages = LogMessages(random_timed_log_messages(2000, seed, ordered))
+    for end_times in random_end_times(log_messages, seed):
+        for seconds in [1, 3]:
+            intersection = log_messages.time_windows_intersection(column, end_times, seconds)
+
+            assert intersection == merged_intersection(log_messages.log_messages, column, end_times, seconds)
@@ -0,0 +1,20 @@
+import json
+from mining import RootCauseMining
+
+
+def mined_line_ids(results_file) -> list[int]:
+    return sorted(json.loads(line)['line_id'] for line in results_file.read_text().splitlines())
+
+
+def test_all_recurring_templates_are_mined_by_default(settings, tmp_path):
+    results_file = tmp_path / 'tiny.root_causes.jsonl'
+
+    assert RootCauseMining(settings).mine(str(results_file)) == 6
+    assert mined_line_ids(results_file) == [294, 295, 296, 297, 298, 299]
+
+
+def test_error_filter_selects_templates(settings, tmp_path):
+    results_file = tmp_path / 'tiny.root_causes.jsonl'
+
+    assert RootCauseMining(settings).mine(str(results_file), error_filter=['^Disk full']) == 1
+    assert mined_line_ids(results_file) == [299]
@@ -0,0 +1,65 @@
+import copy
+import pandas as pd
+from preparation import DatasetPreparation
+import pytest
+from search import RootCauseSearch
+from settings import SearchStrategy
+
+
+def test_kept_dataset_is_loaded_once(settings, monkeypatch):
+    loads = []
+    get = DatasetPreparation.get
+
+    def counted_get(preparation, is_reload):
+        loads.append(is_reload)
+        return get(preparation, is_reload)
+
+    monkeypatch.setattr(DatasetPreparation, 'get', counted_get)
+    root_cause_search = RootCauseSearch(settings)
+
+    first = [entry.to_dict() for entry in root_cause_search.search(299)]
+    second = [entry.to_dict() for entry in root_cause_search.search(299)]
+
+    assert len(loads) == 1
+    assert first == second
+    assert [entry['line_id'] for entry in first] == [298, 299]
+
+
+@pytest.mark.parametrize('storage_format', ['csv', 'feather'])
+def test_appended_dataset_is_reloaded(settings, tmp_path, storage_format):
+    settings.storage_format = storage_format
+    lines = pd.read_csv(settings.source_csv_file)
+    lines[:200].to_csv(settings.source_csv_file, index=False)
+    lines[200:].to_csv(tmp_path / 'tiny.appended.csv', index=False)
+
+    root_cause_search = RootCauseSearch(settings)
+    root_cause_search.search(199)
+    service_template_ids = root_cause_search.log_messages.log_messages['service_template_id'].copy()
+    root_cause_search.append(str(tmp_path / 'tiny.appended.csv'))
+    appended = [entry.to_dict() for entry in root_cause_search.search(299)]
+
+    reloaded_search = RootCauseSearch(settings)
+    reloaded = [entry.to_dict() for entry in reloaded_search.search(299)]
+    reloaded_ids = reloaded_search.log_messages.log_messages['service_template_id']
+
+    assert reloaded == appended
+    assert [entry['line_id'] for entry in reloaded] == [298, 299]
+    assert reloaded_ids[service_template_ids.index].tolist() == service_template_ids.tolist()
+
+
+def test_search_workers_find_the_same_root_causes(settings):
+    settings.strategies = [SearchStrategy(window_seconds=1), SearchStrategy('service_template_id', window_seconds=2)]
+    serial_search = RootCauseSearch(settings)
+    serial = serial_search.search_many([149, 249, 299])
+
+    settings = copy.copy(settings)
+    settings.search_workers = 2
+    parallel_search = RootCauseSearch(settings)
+    try:
+        parallel = parallel_search.search_many([149, 249, 299])
+    finally:
+        parallel_search.close()
+
+    assert {line_id: [entry.to_dict() for entry in root_cause] for line_id, root_cause in parallel.items()} == {
+        line_id: [entry.to_dict() for entry in root_cause] for line_id, root_cause in serial.items()
+    }
@@ -0,0 +1,66 @@
+import json
+import pytest
+from server import SearchServer
+import threading
+import urllib.error
+import urllib.request
+
+
+@pytest.fixture
+def server_url(settings):
+    server = SearchServer(('127.0.0.1', 0), settings)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def request(url: str, body: bytes = None) -> tuple[int, dict]:
+    try:
+        with urllib.request.urlopen(url, body) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def test_health(server_url):
+    status, response = request(f'{server_url}/health')
+
+    assert status == 200
+    assert response['status'] == 'ok'
+    assert response['log_messages'] == 300
+
+
+def test_search(server_url):
+    status, response = request(f'{server_url}/search', json.dumps({'line_id': 299}).encode('utf-8'))
+
+    assert status == 200
+    assert response['line_id'] == 299
+    assert [entry['line_id'] for entry in response['root_cause']] == [298, 299]
+
+
+def test_search_many(server_url):
+    status, response = request(f'{server_url}/search_many', json.dumps({'line_ids': [249, 299]}).encode('utf-8'))
+
+    assert status == 200
+    assert {
+        line_id: [entry['line_id'] for entry in root_cause] for line_id, root_cause in response['root_causes'].items()
+    } == {'249': [248, 249], '299': [298, 299]}
+
+
+def test_bad_requests(server_url):
+    assert request(f'{server_url}/search', b'{"line_id": ')[0] == 400
+    assert request(f'{server_url}/search', json.dumps({'line': 299}).encode('utf-8'))[0] == 400
+    assert request(f'{server_url}/search', json.dumps({'line_id': 1000}).encode('utf-8'))[0] == 404
+    assert request(f'{server_url}/unknown')[0] == 404
+
+
+def test_settings_of_caller_are_not_changed(settings):
+    settings.keep_dataset_loaded = False
+    server = SearchServer(('127.0.0.1', 0), settings)
+    server.server_close()
+
+    assert server.settings.keep_dataset_loaded
+    assert not settings.keep_dataset_loaded
@@ -0,0 +1,19 @@
+import pytest
+import re
+from settings import FilterPattern
+
+
+@pytest.mark.parametrize('patterns', [
+    ['Disk', 'replica [0-3]'],
+    ['(?P<volume>volume 1)', '(?P<volume>volume 2)'],
+    ['(Disk)?(?(1) full| handled)', 'lost$'],
+    [r'(\d) \1', 'Request'],
+    ['(?i)disk', 'Request']
+])
+def test_filter_pattern_matches_like_separate_patterns(patterns):
+    filter_pattern = FilterPattern(patterns)
+    texts = [
+        'Disk full on volume 1', 'disk full on volume 2', 'Connection to replica 5 lost', 'Request handled in 3 3 ms'
+    ]
+    for text in texts:
+        assert filter_pattern.matches(text) == any(re.search(pattern, text) is not None for pattern in patterns)